@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Compare the memory used by the slot based domain objects with the same
+attributes held in a per-instance ``__dict__``, and report the resident size
+of a catalog of N videos.
+
+    python bin/bench_memory.py [N]
+"""
+
+import sys
+import resource
+
+from pybrightcove import video, playlist
+
+VIDEO_DATA = {
+    'creationDate': 1272312315000, 'economics': 'FREE', 'id': 0,
+    'lastModifiedDate': 1272312315000, 'length': 55000, 'linkText': None,
+    'linkURL': None, 'longDescription': "A really long description.",
+    'name': "My Video", 'playsTotal': 100, 'playsTrailingWeek': 40,
+    'publishedDate': 1272312315000, 'referenceId': 'ref',
+    'shortDescription': "this is a short description",
+    'tags': ['news', 'sports', 'highlights'], 'thumbnailURL': 'http://t/',
+    'videoStillURL': 'http://s/'}
+PLAYLIST_DATA = {'id': 1, 'referenceId': 'ref', 'name': 'Playlist',
+    'shortDescription': 'desc', 'thumbnailURL': None, 'videoIds': [1, 2],
+    'playlistType': 'EXPLICIT'}
+
+
+class _DictObject(object):
+    pass
+
+
+def _slot_size(obj):
+    return sys.getsizeof(obj)
+
+
+def _dict_size(obj):
+    """
+    Size of an equivalent object keeping the same attributes in a __dict__.
+    """
+    twin = _DictObject()
+    for name in type(obj).__slots__:
+        try:
+            setattr(twin, name, object.__getattribute__(obj, name))
+        except AttributeError:
+            pass
+    return sys.getsizeof(twin) + sys.getsizeof(twin.__dict__)
+
+
+def _maxrss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main(count):
+    conn = object.__new__(video.connection.APIConnection)
+    samples = [
+        video.Video(data=VIDEO_DATA, _connection=conn),
+        video.Rendition({'size': 1, 'remoteUrl': None, 'videoDuration': 1,
+            'videoCodec': 'H264'}),
+        video.CuePoint({'name': 'c', 'video_id': 1, 'time': 1,
+            'forceStop': False, 'type': 'AD', 'metadata': None}),
+        video.Image({'id': 1, 'referenceId': 'r', 'type': 'THUMBNAIL',
+            'remoteUrl': 'u', 'displayName': 'd'}),
+        playlist.Playlist(data=PLAYLIST_DATA, connection=conn)]
+    print "%-10s %10s %10s %8s" % ("class", "__dict__", "__slots__", "saved")
+    for obj in samples:
+        before, after = _dict_size(obj), _slot_size(obj)
+        print "%-10s %10d %10d %7d%%" % (type(obj).__name__, before, after,
+            100 - 100 * after / before)
+
+    start = _maxrss_mb()
+    videos = []
+    for i in xrange(count):
+        data = dict(VIDEO_DATA)
+        data['id'] = i
+        data['tags'] = list(VIDEO_DATA['tags'])
+        videos.append(video.Video(data=data, _connection=conn))
+    print "%d videos: %.1f MB resident growth (raw data included)" % (
+        count, _maxrss_mb() - start)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
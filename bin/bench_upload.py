@@ -0,0 +1,136 @@
+#!/usr/bin/python
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Measure the throughput and the client CPU time of a multipart file upload
+through ``pybrightcove.http_core`` against a local HTTP sink, for each way
+the file body can be sent: ``sendfile``, ``readinto`` into a reusable buffer
+and plain ``read``.
+
+    PYTHONPATH=. python bin/bench_upload.py [MB] [runs]
+"""
+
+import os
+import sys
+import time
+import resource
+import tempfile
+import multiprocessing
+import BaseHTTPServer
+
+from pybrightcove import http_core
+
+
+class _SinkHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        remaining = int(self.headers['Content-Length'])
+        while remaining:
+            count = len(self.rfile.read(min(remaining, 1024 * 1024)))
+            if not count:
+                break
+            remaining -= count
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write('{}')
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(server):
+    server.serve_forever()
+
+
+class _File(object):
+    """
+    A file that only offers read, to measure the plain read path.
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self.name = fp.name
+
+    def read(self, size):
+        return self._fp.read(size)
+
+
+def _upload(port, path, mode):
+    fp = open(path, 'rb')
+    size = os.path.getsize(path)
+    req = http_core.HttpRequest('http://127.0.0.1:%d/upload' % port, 'POST')
+    req.add_body_part('JSONRPC', '{}', 'text/plain')
+    body = fp if mode != 'read' else _File(fp)
+    req.add_body_part('filePath', body, 'application/octet-stream',
+        size=size)
+    req.end_of_parts()
+    sendfile = http_core.SENDFILE
+    if mode != 'sendfile':
+        http_core.SENDFILE = None
+    try:
+        response = http_core.PooledHttpClient(http_core.ConnectionPool()) \
+            .request(req)
+    finally:
+        http_core.SENDFILE = sendfile
+        fp.close()
+    assert response.status == 200
+
+
+def _cpu():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main(megabytes, runs):
+    fd, path = tempfile.mkstemp(prefix='pybrightcove-bench')
+    chunk = os.urandom(1024 * 1024)
+    for i in xrange(megabytes):
+        os.write(fd, chunk)
+    os.close(fd)
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), _SinkHandler)
+    sink = multiprocessing.Process(target=_serve, args=(server, ))
+    sink.daemon = True
+    sink.start()
+    port = server.server_address[1]
+    modes = ['readinto', 'read']
+    if http_core.SENDFILE is not None:
+        modes.insert(0, 'sendfile')
+    try:
+        print "%-10s %10s %12s" % ("mode", "MB/s", "CPU s/GB")
+        for mode in modes:
+            elapsed = cpu = 0.0
+            for i in xrange(runs):
+                started, cpu_started = time.time(), _cpu()
+                _upload(port, path, mode)
+                elapsed += time.time() - started
+                cpu += _cpu() - cpu_started
+            print "%-10s %10.1f %12.3f" % (mode, megabytes * runs / elapsed,
+                cpu * 1024 / (megabytes * runs))
+    finally:
+        sink.terminate()
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 256,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3)
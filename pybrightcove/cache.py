@@ -0,0 +1,132 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+An in-process cache for the responses of read API commands.  Pass a
+``ResponseCache`` to ``pybrightcove.connection.APIConnection`` to enable it::
+
+    cache = ResponseCache(max_entries=5000, max_bytes=50 * 1024 * 1024,
+        ttls={'find_video_by_id': 300, 'find_all_videos': 0})
+    conn = APIConnection(cache=cache)
+"""
+
+import time
+import threading
+
+from collections import OrderedDict
+
+
+class ResponseCache(object):
+    """
+    A bounded LRU cache of raw response bodies keyed on the normalized
+    (command, parameters) pair of a read call.
+
+    Entries expire after the TTL of their command (``ttls``, falling back to
+    ``default_ttl``; a TTL of 0 disables caching for that command).  Least
+    recently used entries are evicted once there are more than
+    ``max_entries`` entries or their bodies add up to more than ``max_bytes``.
+    ``hits`` and ``misses`` count lookups.  The cache is safe to share between
+    threads and connections.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=10 * 1024 * 1024,
+        default_ttl=60, ttls=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(command, params):
+        """
+        Build the cache key of a call.  Parameters with empty values are left
+        out, as they are not sent to the API.
+        """
+        items = []
+        for name, val in params.items():
+            if name and val:
+                if isinstance(val, (list, tuple)):
+                    val = ",".join([str(v) for v in val])
+                items.append((name, str(val)))
+        items.sort()
+        return (command, tuple(items))
+
+    def ttl(self, command):
+        """
+        The number of seconds responses to ``command`` are cached for.
+        """
+        return self.ttls.get(command, self.default_ttl)
+
+    def get(self, key):
+        """
+        Return the cached body for ``key``, or None.
+        """
+        self._lock.acquire()
+        try:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    self.size -= len(entry[0])
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+        finally:
+            self._lock.release()
+
+    def set(self, key, body):
+        """
+        Cache ``body`` as the response for ``key``.
+        """
+        ttl = self.ttl(key[0])
+        if not ttl or len(body) > self.max_bytes:
+            return
+        self._lock.acquire()
+        try:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = (body, time.time() + ttl)
+            self.size += len(body)
+            while len(self._entries) > self.max_entries or \
+                self.size > self.max_bytes:
+                evicted = self._entries.popitem(last=False)[1]
+                self.size -= len(evicted[0])
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self.size = 0
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        return len(self._entries)
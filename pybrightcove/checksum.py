@@ -0,0 +1,328 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+MD5 checksums of upload files, remembered so that an unchanged file is only
+read once to compute them.
+
+Checksums are keyed on the path, inode, size and modification time of the
+file.  They are kept in memory and, when the ``checksum_cache`` option of the
+``Cache`` config section names a file, in a SQLite database in that file so
+that they survive the process::
+
+    [Cache]
+    checksum_cache = /var/cache/pybrightcove/checksums.db
+
+``md5_async`` hashes files on a pool of threads and returns immediately.
+"""
+
+import os
+import mmap
+import hashlib
+import sqlite3
+import threading
+
+from multiprocessing.pool import ThreadPool
+
+from pybrightcove import config
+
+
+BLOCK_SIZE = 262144  ## 256KB
+MMAP_THRESHOLD = 8 * 1024 * 1024
+MMAP_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def _file_size(fp):
+    try:
+        return os.fstat(fp.fileno()).st_size
+    except (AttributeError, TypeError, ValueError, OSError):
+        return None
+
+
+def compute_md5(filename):
+    """
+    Read ``filename`` and return the hex MD5 digest of its content.  Files of
+    ``MMAP_THRESHOLD`` bytes or more are memory-mapped and hashed in place
+    instead of being copied through read buffers.
+    """
+    md5 = hashlib.md5()
+    fp = file(filename, 'rb')
+    try:
+        size = _file_size(fp)
+        if size is not None and size >= MMAP_THRESHOLD:
+            data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for offset in xrange(0, size, MMAP_BLOCK_SIZE):
+                    md5.update(buffer(data, offset, MMAP_BLOCK_SIZE))
+            finally:
+                data.close()
+        else:
+            bits = fp.read(BLOCK_SIZE)
+            while bits:
+                md5.update(bits)
+                bits = fp.read(BLOCK_SIZE)
+    finally:
+        fp.close()
+    return md5.hexdigest()
+
+
+class HashingReader(object):
+    """
+    Wraps a file-like object, such as a pipe, or an iterable of strings and
+    computes the MD5 digest of the data as it is read through it, so that a
+    stream can be uploaded and hashed in one pass.
+
+    Iterating over the reader yields the data in blocks.  ``hexdigest()``
+    returns the digest of the data read so far.  ``name`` is the file name
+    sent with the upload; it defaults to the name of the wrapped object.
+    """
+
+    def __init__(self, data, name=None):
+        self.data = data
+        self.name = name or getattr(data, 'name', None)
+        self._md5 = hashlib.md5()
+
+    def __iter__(self):
+        if hasattr(self.data, 'read'):
+            blocks = iter(lambda: self.data.read(BLOCK_SIZE), '')
+        else:
+            blocks = iter(self.data)
+        for block in blocks:
+            if not block:
+                continue
+            self._md5.update(block)
+            yield block
+
+    def hexdigest(self):
+        """
+        The hex MD5 digest of the data read so far.
+        """
+        return self._md5.hexdigest()
+
+
+class ChecksumCache(object):
+    """
+    A cache of file checksums, persisted to the SQLite database at ``path``
+    if one is given.  ``hits`` and ``misses`` count lookups.  The cache is
+    safe to share between threads.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS checksums ("
+                "path TEXT PRIMARY KEY, inode INTEGER, size INTEGER, "
+                "mtime REAL, md5 TEXT NOT NULL)")
+            self._db.commit()
+
+    @staticmethod
+    def key(filename):
+        """
+        The (path, inode, size, mtime) key of ``filename``.
+        """
+        stat = os.stat(filename)
+        return (os.path.abspath(filename), stat.st_ino, stat.st_size,
+            stat.st_mtime)
+
+    def get(self, key):
+        """
+        Return the checksum stored for ``key``, or None.
+        """
+        self._lock.acquire()
+        try:
+            digest = self._entries.get(key)
+            if digest is None and self._db is not None:
+                rows = self._db.execute("SELECT md5 FROM checksums WHERE "
+                    "path = ? AND inode = ? AND size = ? AND mtime = ?",
+                    key).fetchall()
+                if rows:
+                    digest = str(rows[0][0])
+                    self._entries[key] = digest
+            if digest is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return digest
+        finally:
+            self._lock.release()
+
+    def set(self, key, digest):
+        """
+        Store the checksum of ``key``, replacing any checksum stored for an
+        earlier version of the same path.
+        """
+        self._lock.acquire()
+        try:
+            self._entries[key] = digest
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO checksums "
+                    "(path, inode, size, mtime, md5) VALUES (?, ?, ?, ?, ?)",
+                    key + (digest, ))
+                self._db.commit()
+        finally:
+            self._lock.release()
+
+    def md5(self, filename):
+        """
+        Return the hex MD5 digest of ``filename``, reading the file only if
+        it is not in the cache.
+        """
+        try:
+            key = self.key(filename)
+        except OSError:
+            return compute_md5(filename)
+        digest = self.get(key)
+        if digest is None:
+            digest = compute_md5(filename)
+            # The file may have changed while it was read.
+            try:
+                if self.key(filename) == key:
+                    self.set(key, digest)
+            except OSError:
+                pass
+        return digest
+
+
+_default = {'cache': None}
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    Return the ``ChecksumCache`` used by ``md5``, created on first use from
+    the ``checksum_cache`` config option.
+    """
+    _default_lock.acquire()
+    try:
+        if _default['cache'] is None:
+            path = None
+            if config.has_option('Cache', 'checksum_cache'):
+                path = config.get('Cache', 'checksum_cache')
+            _default['cache'] = ChecksumCache(path)
+        return _default['cache']
+    finally:
+        _default_lock.release()
+
+
+def set_default_cache(cache):
+    """
+    Replace the ``ChecksumCache`` used by ``md5``.  Passing None creates a
+    new one from the config on next use.
+    """
+    _default_lock.acquire()
+    try:
+        _default['cache'] = cache
+    finally:
+        _default_lock.release()
+
+
+class HashEngine(object):
+    """
+    Computes checksums on a pool of ``workers`` threads; hashlib releases the
+    GIL while hashing, so files are hashed in parallel.
+
+    ``submit`` returns a ``multiprocessing.pool.AsyncResult``; call ``get()``
+    on it to wait for the digest.  A file that is already being hashed is not
+    hashed twice: ``submit`` returns the pending result.  Digests go through
+    ``cache``, or the default ``ChecksumCache`` if it is None.
+    """
+
+    def __init__(self, workers=4, cache=None):
+        self.workers = workers
+        self.cache = cache
+        self._pool = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _hash(self, path):
+        try:
+            return (self.cache or get_default_cache()).md5(path)
+        finally:
+            self._lock.acquire()
+            try:
+                del self._pending[path]
+            finally:
+                self._lock.release()
+
+    def pending(self, filename):
+        """
+        Return the result of ``filename`` if it is being hashed, or None.
+        """
+        self._lock.acquire()
+        try:
+            return self._pending.get(os.path.abspath(filename))
+        finally:
+            self._lock.release()
+
+    def submit(self, filename):
+        """
+        Start hashing ``filename`` and return its result.
+        """
+        path = os.path.abspath(filename)
+        self._lock.acquire()
+        try:
+            result = self._pending.get(path)
+            if result is None:
+                if self._pool is None:
+                    self._pool = ThreadPool(self.workers)
+                # The worker removes the entry under the lock, so it cannot
+                # do so before it has been added.
+                result = self._pool.apply_async(self._hash, (path, ))
+                self._pending[path] = result
+            return result
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """
+        Stop the worker threads once the pending files have been hashed.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+_engine = HashEngine()
+
+
+def md5_async(filename):
+    """
+    Start hashing ``filename`` with the default ``HashEngine`` and return
+    its ``AsyncResult``.
+    """
+    return _engine.submit(filename)
+
+
+def md5(filename):
+    """
+    Return the hex MD5 digest of ``filename`` from the default cache, waiting
+    for the default ``HashEngine`` if it is already hashing the file.
+    """
+    result = _engine.pending(filename)
+    if result is not None:
+        return result.get()
+    return get_default_cache().md5(filename)
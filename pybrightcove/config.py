@@ -22,10 +22,20 @@ Configuration for pybrightcove is fairly simple and uses standard ini type file
 structure found in ``~/.pybrightcove`` for a user level one or 
 ``/etc/pybrightcove.cfg`` for one at the system level.  User config files
 supercede those at the system level.
+
+Options can also be set with environment variables named
+``PYBRIGHTCOVE_<SECTION>_<NAME>``, for example
+``PYBRIGHTCOVE_CONNECTION_READ_TOKEN``; these supercede both files.
+
+The files are parsed once and kept in memory.  They are checked for changes at
+most every ``CHECK_INTERVAL`` seconds and re-read when their modification time
+changes.
 """
 
 import os
 import sys
+import time
+import threading
 import ConfigParser
 
 from pybrightcove import __version__
@@ -37,21 +47,76 @@ CONFIG_LOCATIONS = [CONFIG_PATH, USER_CONFIG_PATH]
 USER_AGENT = 'PyBrightcove/%s (%s)' % (__version__, sys.platform)
 
 
+CHECK_INTERVAL = 1
+DEFAULTS = {"working_dir": "/tmp", "debug": "0"}
+
+_lock = threading.Lock()
+_snapshot = {'parser': None, 'mtimes': None, 'checked': 0}
+
+
+def _mtimes():
+    """
+    The modification time of each config file, None for missing files.
+    """
+    mtimes = []
+    for path in CONFIG_LOCATIONS:
+        try:
+            mtimes.append(os.stat(path).st_mtime)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+def _parser():
+    """
+    Return the parsed config files, re-reading them if they have changed.
+    """
+    now = time.time()
+    _lock.acquire()
+    try:
+        if _snapshot['parser'] is None or \
+            now - _snapshot['checked'] >= CHECK_INTERVAL:
+            mtimes = _mtimes()
+            if _snapshot['parser'] is None or mtimes != _snapshot['mtimes']:
+                cfg = ConfigParser.SafeConfigParser(DEFAULTS)
+                cfg.read(CONFIG_LOCATIONS)
+                _snapshot['parser'] = cfg
+                _snapshot['mtimes'] = mtimes
+            _snapshot['checked'] = now
+        return _snapshot['parser']
+    finally:
+        _lock.release()
+
+
+def reload():
+    """
+    Force the config files to be read again on the next lookup.
+    """
+    _lock.acquire()
+    try:
+        _snapshot['parser'] = None
+    finally:
+        _lock.release()
+
+
+def _env_name(section, name):
+    return ('PYBRIGHTCOVE_%s_%s' % (section, name)).upper()
+
+
 def has_option(section, name):
     """
     Wrapper around ConfigParser's ``has_option`` method.
     """
-    cfg = ConfigParser.SafeConfigParser({"working_dir": "/tmp", "debug": "0"})
-    cfg.read(CONFIG_LOCATIONS)
-    return cfg.has_option(section, name)
+    if _env_name(section, name) in os.environ:
+        return True
+    return _parser().has_option(section, name)
 
 
 def get(section, name):
     """
     Wrapper around ConfigParser's ``get`` method.
     """
-    cfg = ConfigParser.SafeConfigParser({"working_dir": "/tmp", "debug": "0"})
-    cfg.read(CONFIG_LOCATIONS)
-    val = cfg.get(section, name)
+    val = os.environ.get(_env_name(section, name))
+    if val is None:
+        val = _parser().get(section, name)
     return val.strip("'").strip('"')
-
@@ -23,21 +23,47 @@ and from the actual APIs.
 """
 
 import os
-import hashlib
+import sys
+import time
 import simplejson
 import urllib2
 import urllib
-import tempfile
+import uuid
+import StringIO
 import ftplib
+import itertools
+import threading
+import collections
+
+from multiprocessing.pool import ThreadPool
 
 from xml.dom import minidom
 
 #import pybrightcove
 
 from pybrightcove import config
+from pybrightcove import checksum
 from pybrightcove import http_core
 from pybrightcove import enums
 from pybrightcove import exceptions
+from pybrightcove.cache import ResponseCache
+from pybrightcove.metrics import Metrics, NULL_METRICS
+
+
+# The file name sent with streamed uploads that have no name of their own.
+STREAM_FILENAME = 'upload'
+
+
+def _stream_filename(stream):
+    """
+    Return the file name to send a stream under.  Pipes and other files
+    opened without a path have a pseudo-name such as ``<fdopen>``, which is
+    not sent.
+    """
+    name = getattr(stream, 'name', None)
+    if not isinstance(name, basestring) or not name or name.startswith('<'):
+        return STREAM_FILENAME
+    return os.path.basename(name)
 
 
 class Connection(object):
@@ -85,20 +111,138 @@ class Connection(object):
         raise Exception("Base class must implement this method.")
 
 
+def _quit(ftp):
+    """
+    Log out of an FTP session, closing it even if the server does not reply.
+    """
+    try:
+        ftp.quit()
+    except (ftplib.all_errors + (EOFError, )):
+        ftp.close()
+
+
+class FTPSessionPool(object):
+    """
+    Keeps logged in FTP sessions open for reuse, so that the files of a batch
+    delivery, and of later deliveries, do not each pay for a new login.
+
+    Sessions are grouped by (host, user).  At most ``max_size`` idle sessions
+    are kept per group, sessions idle for longer than ``idle_timeout``
+    seconds are closed rather than reused, and every session is checked with
+    ``NOOP`` before it is handed out again.  The pool is safe to share
+    between threads and connections.
+    """
+
+    def __init__(self, max_size=4, idle_timeout=60):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return a healthy idle session for ``key``, or None.
+        """
+        now = time.time()
+        while True:
+            self._lock.acquire()
+            try:
+                idle = self._idle.get(key)
+                if not idle:
+                    return None
+                ftp, released_at = idle.pop()
+            finally:
+                self._lock.release()
+            if now - released_at < self.idle_timeout:
+                try:
+                    ftp.voidcmd('NOOP')
+                    return ftp
+                except (ftplib.all_errors + (EOFError, )):
+                    pass
+            _quit(ftp)
+
+    def put(self, key, ftp):
+        """
+        Return a session to the pool once its transfer is done.
+        """
+        self._lock.acquire()
+        try:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_size:
+                idle.append((ftp, time.time()))
+                return
+        finally:
+            self._lock.release()
+        _quit(ftp)
+
+    def clear(self):
+        """
+        Log out of every idle session.
+        """
+        self._lock.acquire()
+        try:
+            idle, self._idle = self._idle, {}
+        finally:
+            self._lock.release()
+        for sessions in idle.values():
+            for ftp, _ in sessions:
+                _quit(ftp)
+
+    def size(self):
+        """
+        The number of idle sessions held.
+        """
+        self._lock.acquire()
+        try:
+            return sum([len(idle) for idle in self._idle.values()])
+        finally:
+            self._lock.release()
+
+
 class FTPConnection(Connection):
     """
     Connection to use when wanting to interface with Brightcove via the batch
     FTP interface.
+
+    With ``resume`` set, a transfer that this connection started and that
+    failed, such as one whose link dropped, is completed from the size
+    stored on the server with ``REST`` when the same local file is sent
+    again, rather than sent again in full.  A file of the same name that the
+    connection did not start storing, or that it started storing from a
+    different local file, is always overwritten.  The size stored is checked
+    against the local size after each transfer.  Pass a
+    ``pybrightcove.retry.RetryPolicy`` as ``retry`` to resume transfers that
+    fail with a transient error.
+
+    Logged in sessions are kept in ``pool``, a ``FTPSessionPool``, and
+    reused for every file and every ``post``; call ``close`` to log out of
+    them.
+
+    The assets of a ``post`` are uploaded on up to ``workers`` sessions at
+    once.  The threads are shared by every ``post`` made with the
+    connection, so titles posted from several threads, for example by a
+    ``pybrightcove.upload.UploadManager``, share the same ``workers``
+    sessions.  The manifest of a title is only sent once each of its assets
+    has been stored; if any of them fails, the error is raised and no
+    manifest is sent.
     """
 
     def __init__(self, host=None, user=None, password=None, publisher_id=None,
-        preparer=None, report_success=False):
+        preparer=None, report_success=False, resume=True, retry=None,
+        pool=None, workers=4):
         # pylint: disable=R0913
         super(FTPConnection, self).__init__(host=host, user=user,
             password=password, publisher_id=publisher_id, preparer=preparer,
             report_success=report_success)
         self.notifications = []
         self.callback = None
+        self.resume = resume
+        self.retry = retry
+        self._started = {}
+        self.workers = workers
+        self.pool = pool or FTPSessionPool(max_size=max(4, workers))
+        self._threads = None
+        self._threads_lock = threading.Lock()
 
     def get_manifest(self, asset_xml):
         """
@@ -119,16 +263,120 @@ class FTPConnection(Connection):
         manifest += '</publisher-upload-manifest>'
         return manifest
 
+    @staticmethod
+    def _remote_size(ftp, name):
+        """
+        The size of ``name`` on the server, or None if it is not there or the
+        server does not support ``SIZE``.
+        """
+        try:
+            return ftp.size(name)
+        except ftplib.error_perm:
+            return None
+
+    def _session(self):
+        """
+        A logged in session, from the pool if one is idle.
+        """
+        # pylint: disable=E1101
+        ftp = self.pool.get((self.host, self.user))
+        if ftp is None:
+            ftp = ftplib.FTP(host=self.host)
+            ftp.login(user=self.user, passwd=self.password)
+            ftp.set_pasv(True)
+        return ftp
+
+    def _store(self, name, size, open_upload, identity):
+        """
+        Make one attempt at storing a file, resuming from the size already
+        on the server if an earlier attempt stored part of the same file.
+        ``open_upload`` returns a new file object to read it from, and
+        ``identity`` identifies the local file.
+        """
+        ftp = self._session()
+        try:
+            # SIZE is only reliable in binary mode.
+            ftp.voidcmd('TYPE I')
+            offset = 0
+            if self.resume and self._started.get(name) == identity:
+                offset = self._remote_size(ftp, name) or 0
+                if offset > size:
+                    offset = 0
+            self._started[name] = identity
+            if not offset or offset < size:
+                upload = open_upload()
+                try:
+                    upload.seek(offset)
+                    ftp.storbinary("STOR %s" % name, upload,
+                        rest=offset or None)
+                finally:
+                    upload.close()
+            stored = self._remote_size(ftp, name)
+            if stored is not None and stored != size:
+                raise exceptions.IncompleteUploadError(
+                    "Stored %d of %d bytes of %s" % (stored, size, name))
+        except:
+            # The session may be in any state, so it is not reused.
+            _quit(ftp)
+            raise
+        self._started.pop(name, None)
+        # pylint: disable=E1101
+        self.pool.put((self.host, self.user), ftp)
+
+    def _send(self, name, size, open_upload, identity):
+        """
+        Store a file, resuming it according to the ``retry`` policy.
+        """
+        if self.retry is None:
+            return self._store(name, size, open_upload, identity)
+        # Each attempt resumes where the last one stopped, so unlike API
+        # writes a failed transfer is always safe to retry.
+        return self.retry.call(
+            lambda: self._store(name, size, open_upload, identity))
+
     def _send_file(self, filename):
         """
         Sends a file via FTP.
         """
-        # pylint: disable=E1101
-        ftp = ftplib.FTP(host=self.host)
-        ftp.login(user=self.user, passwd=self.password)
-        ftp.set_pasv(True)
-        ftp.storbinary("STOR %s" % os.path.basename(filename),
-            file(filename, 'rb'))
+        size = os.path.getsize(filename)
+        try:
+            identity = (os.path.abspath(filename), size,
+                os.stat(filename).st_mtime)
+        except OSError:
+            identity = (os.path.abspath(filename), size)
+        self._send(os.path.basename(filename), size,
+            lambda: file(filename, 'rb'), identity)
+
+    def _send_manifest(self, manifest):
+        """
+        Sends the manifest from memory, under a name of its own.
+        """
+        name = "pybrightcove-manifest-%s.xml" % uuid.uuid4().hex
+        self._send(name, len(manifest),
+            lambda: StringIO.StringIO(manifest), (name, len(manifest)))
+        return name
+
+    def _send_files(self, filenames):
+        """
+        Sends files via FTP on up to ``workers`` sessions at once, and waits
+        for every transfer to end before raising the first error, if any.
+        """
+        if self.workers <= 1 or len(filenames) <= 1:
+            for filename in filenames:
+                self._send_file(filename)
+            return
+        self._threads_lock.acquire()
+        try:
+            if self._threads is None:
+                self._threads = ThreadPool(self.workers)
+            results = [self._threads.apply_async(self._send_file, (filename,))
+                for filename in filenames]
+        finally:
+            self._threads_lock.release()
+        for result in results:
+            result.wait()
+        for result in results:
+            result.get()
 
     def post(self, **kwargs):
         xml = kwargs.get("xml")
@@ -142,17 +390,24 @@ class FTPConnection(Connection):
         ## Make sure it is well formed at least
         minidom.parseString(manifest)
 
-        ## Record manifest
-        fpno, fname = tempfile.mkstemp(suffix=".xml", 
-            prefix="pybrightcove-manifest")
-        fp_out = os.fdopen(fpno, 'wb')
-        fp_out.write(manifest)
-        fp_out.close()
+        ## Upload files, then the manifest once all of them are stored
+        self._send_files([asset['filename'] for asset in assets])
+        self._send_manifest(manifest)
 
-        ## Upload files and manifest
-        for asset in assets:
-            self._send_file(asset['filename'])
-        self._send_file(fname)
+    def close(self):
+        """
+        Wait for the transfers in progress, stop the upload threads and log
+        out of the idle FTP sessions of the connection.
+        """
+        self._threads_lock.acquire()
+        try:
+            threads, self._threads = self._threads, None
+        finally:
+            self._threads_lock.release()
+        if threads is not None:
+            threads.close()
+            threads.join()
+        self.pool.clear()
 
     def get_list(self, **kwargs):
         # pylint: disable=W,C,R
@@ -163,13 +418,42 @@ class FTPConnection(Connection):
         raise Exception("This method is invalid for an FTP Connection")
 
 
+class _Flight(object):
+    """
+    A read call in progress that identical calls wait on.
+    """
+    # pylint: disable=R0903
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.body = None
+        self.exc_info = None
+
+    def wait(self):
+        """
+        Wait for the call to end and return the body of its response or
+        raise its error.
+        """
+        self.done.wait()
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.body
+
+
 class APIConnection(Connection):
     """
     Connection to use when wanting to interface with the Brightcove Media API.
+
+    With ``coalesce`` set, a read call made while an identical one (same
+    command and parameters) is in progress on another thread waits for that
+    call and decodes its own copy of the response, or raises its error,
+    instead of making a request of its own.
     """
 
     def __init__(self, read_token=None, write_token=None, read_url=None,
-        write_url=None):
+        write_url=None, pool=None, cache=None, metrics=None, retry=None,
+        rate_limiter=None, coalesce=True):
+        # pylint: disable=R0913
         super(APIConnection, self).__init__(read_token=read_token,
             write_token=write_token, read_url=read_url, write_url=write_url)
         if not hasattr(self, "read_token"):
@@ -177,6 +461,61 @@ class APIConnection(Connection):
                 "Must specify at least a read_token.")
         self._api_url = None
         self._api_raw_data = None
+        self._http = http_core.PooledHttpClient(pool)
+        self.cache = cache
+        self.metrics = metrics or NULL_METRICS
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.coalesce = coalesce
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def _request(self, http_request):
+        """
+        Send a request over a pooled keep-alive connection.  Raises
+        ``urllib2.HTTPError`` for non 2xx responses, as ``urllib2.urlopen``
+        does.
+        """
+        http_request.headers['User-Agent'] = config.USER_AGENT
+        response = self._http.request(http_request)
+        if not 200 <= response.status < 300:
+            raise urllib2.HTTPError(str(http_request.uri), response.status,
+                response.reason, response.getheaders(),
+                StringIO.StringIO(response.read()))
+        return response
+
+    def _send(self, command, build_request, decode, write=False):
+        """
+        Make one attempt at a call: send the request returned by
+        ``build_request`` and return the body of the response and its
+        decoded value.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(write)
+        body = None
+        error = None
+        started = time.time()
+        try:
+            body = self._request(build_request()).read()
+            return body, decode(body)
+        except Exception, error:
+            raise
+        finally:
+            self.metrics.request(command, time.time() - started,
+                len(body or ''), error)
+
+    def _call(self, command, build_request, decode, write=False,
+        no_retry=()):
+        """
+        Make a call, retrying transient errors other than those in
+        ``no_retry`` according to the ``retry`` policy of the connection.  A
+        new request is built for each attempt.
+        """
+        def attempt():
+            return self._send(command, build_request, decode, write)
+        if self.retry is None:
+            return attempt()
+        return self.retry.call(attempt, write, no_retry)
 
     def _post(self, data, file_to_upload=None):
         """
@@ -184,46 +523,77 @@ class APIConnection(Connection):
         """
         # pylint: disable=E1101
         params = {"JSONRPC": simplejson.dumps(data)}
-        req = None
-        if file_to_upload:
-            req = http_core.HttpRequest(self.write_url)
-            req.method = 'POST'
-            req.add_body_part("JSONRPC", simplejson.dumps(data), 'text/plain')
-            upload = file(file_to_upload, "rb")
-            req.add_body_part("filePath", upload, 'application/octet-stream')
-            req.end_of_parts()
-            content_type = "multipart/form-data; boundary=%s" % \
-                http_core.MIME_BOUNDARY
-            req.headers['Content-Type'] = content_type
-            req.headers['User-Agent'] = config.USER_AGENT
 
-            req = http_core.ProxiedHttpClient().request(req)
-        else:
-            msg = urllib.urlencode({'json': params['JSONRPC']})
-            req = urllib2.urlopen(self.write_url, msg)
+        def build_request():
+            if file_to_upload:
+                req = http_core.HttpRequest(self.write_url)
+                req.method = 'POST'
+                req.add_body_part("JSONRPC", simplejson.dumps(data),
+                    'text/plain')
+                if isinstance(file_to_upload, basestring):
+                    upload = file(file_to_upload, "rb")
+                    filename = None
+                else:
+                    # The API only takes the file part when it has a name.
+                    upload = file_to_upload
+                    filename = _stream_filename(file_to_upload)
+                req.add_body_part("filePath", upload,
+                    'application/octet-stream', filename=filename)
+                req.end_of_parts()
+                content_type = "multipart/form-data; boundary=%s" % \
+                    http_core.MIME_BOUNDARY
+                req.headers['Content-Type'] = content_type
+            else:
+                msg = urllib.urlencode({'json': params['JSONRPC']})
+                req = http_core.HttpRequest(self.write_url, 'POST', {
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'Content-Length': str(len(msg))})
+                req._body_parts.append(msg)
+            return req
 
-        if req:
-            result = simplejson.loads(req.read())
+        def decode(body):
+            result = simplejson.loads(body)
             if 'error' in result and result['error']:
                 exceptions.BrightcoveError.raise_exception(
                     result['error'])
             return result['result']
 
-    def _get_response(self, **kwargs):
+        if file_to_upload and not isinstance(file_to_upload, basestring):
+            # The body of a streamed upload cannot be replayed, so it is
+            # sent exactly once.
+            result = self._send(data['method'], build_request, decode,
+                write=True)[1]
+        else:
+            result = self._call(data['method'], build_request, decode,
+                write=True)[1]
+        if self.cache is not None:
+            # Any write may change what the read commands return.
+            self.cache.clear()
+        return result
+
+    def _get_request(self, **kwargs):
         """
-        Make the GET request.
+        Build the GET request for a read command.
         """
         # pylint: disable=E1101
         url = self.read_url + "?output=JSON&token=%s" % self.read_token
+        req = http_core.HttpRequest(self.read_url, 'GET')
+        req.uri.query.update({'output': 'JSON', 'token': self.read_token})
         for key in kwargs:
             if key and kwargs[key]:
                 val = kwargs[key]
                 if isinstance(val, (list, tuple)):
                     val = ",".join(val)
                 url += "&%s=%s" % (key, val)
+                req.uri.query[key] = val
         self._api_url = url
-        req = urllib2.urlopen(url)
-        data = simplejson.loads(req.read())
+        return req
+
+    def _decode_response(self, body, kwargs):
+        """
+        Decode the body of a read command, raising the error it reports.
+        """
+        data = simplejson.loads(body)
         self._api_raw_data = data
         if data and data.get('error', None):
             exceptions.BrightcoveError.raise_exception(
@@ -233,22 +603,81 @@ class APIConnection(Connection):
                 "No data found for %s" % repr(kwargs))
         return data
 
+    def _get_response(self, _no_retry=(), **kwargs):
+        """
+        Make the GET request.  Errors in ``_no_retry`` are not retried.
+        """
+        key = None
+        if self.cache is not None or self.coalesce:
+            params = dict(kwargs)
+            command = params.pop('command', None)
+            params.update({'read_url': self.read_url,
+                           'token': self.read_token})
+            key = ResponseCache.key(command, params)
+        if self.cache is not None:
+            body = self.cache.get(key)
+            if body is not None:
+                # Keeps _api_url pointing at the call that was answered.
+                self._get_request(**kwargs)
+                return self._decode_response(body, kwargs)
+        if not self.coalesce:
+            return self._fetch_response(key, kwargs, _no_retry)[1]
+
+        self._inflight_lock.acquire()
+        try:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        finally:
+            self._inflight_lock.release()
+        if not leader:
+            # Each caller decodes its own copy, as it may change the data.
+            return self._decode_response(flight.wait(), kwargs)
+        try:
+            flight.body, data = self._fetch_response(key, kwargs, _no_retry)
+        except Exception:
+            flight.exc_info = sys.exc_info()
+            raise
+        finally:
+            self._inflight_lock.acquire()
+            try:
+                del self._inflight[key]
+            finally:
+                self._inflight_lock.release()
+            flight.done.set()
+        return data
+
+    def _fetch_response(self, key, kwargs, no_retry=()):
+        """
+        Make the GET request over the network and cache its response.
+        Return the body of the response and its decoded value.
+        """
+        body, data = self._call(kwargs.get('command'),
+            lambda: self._get_request(**kwargs),
+            lambda body: self._decode_response(body, kwargs),
+            no_retry=no_retry)
+        if self.cache is not None:
+            self.cache.set(key, body)
+        return body, data
+
     def post(self, command, file_to_upload=None, **kwargs):
+        """
+        Make a write call.  ``file_to_upload`` is the path of a file to
+        upload, sent with its checksum, or a file-like object or iterable of
+        strings that is streamed as it is read.  A stream is sent without a
+        checksum and under its ``name``, or ``STREAM_FILENAME`` if it has
+        none or a pseudo-name such as ``<fdopen>``; wrap it in a ``pybrightcove.checksum.HashingReader`` to get the
+        digest of the data sent.
+        """
         # pylint: disable=W0221,E1101
         data = {"method": command}
         params = {"token": self.write_token}
         for key in kwargs:
             if key and kwargs[key]:
                 params[key] = kwargs[key]
-        if file_to_upload:
-            md5 = hashlib.md5()
-            file_handle = file(file_to_upload, 'rb')
-            bits = file_handle.read(262144)  ## 256KB
-            while bits:
-                md5.update(bits)
-                bits = file_handle.read(262144)
-            file_handle.close()
-            params['file_checksum'] = md5.hexdigest()
+        if isinstance(file_to_upload, basestring):
+            params['file_checksum'] = checksum.md5(file_to_upload)
         data['params'] = params
 
         return self._post(data=data, file_to_upload=file_to_upload)
@@ -257,7 +686,8 @@ class APIConnection(Connection):
         sort_order, **kwargs):
         """
         Not intended to be called directly, but rather through an by the
-        ItemResultSet object iterator.
+        ItemResultSet object iterator.  ``_no_retry`` is a tuple of errors
+        not to retry.
         """
         # pylint: disable=R0913,W0221
         data = self._get_response(command=command,
@@ -272,12 +702,179 @@ class APIConnection(Connection):
                               item_class=item_class,
                               _connection=self)
 
+    def stream_list(self, command, item_class, page_size, page_number,
+        sort_by, sort_order, **kwargs):
+        """
+        Like ``get_list`` but returns a ``StreamingItemCollection`` that
+        decodes the items of the page as they are read off the connection.
+        Streamed pages bypass the response cache.
+        """
+        # pylint: disable=R0913
+        def open_page():
+            req = self._get_request(command=command,
+                                    page_size=page_size,
+                                    page_number=page_number,
+                                    sort_by=sort_by,
+                                    sort_order=sort_order,
+                                    video_fields=None,
+                                    get_item_count="true",
+                                    **kwargs)
+            req.headers['User-Agent'] = config.USER_AGENT
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            started = time.time()
+            try:
+                response = self._http.stream(req)
+            except Exception, error:
+                self.metrics.request(command, time.time() - started, 0,
+                    error)
+                raise
+            if not 200 <= response.status < 300:
+                body = response.read()
+                error = urllib2.HTTPError(str(req.uri), response.status,
+                    response.reason, response.getheaders(),
+                    StringIO.StringIO(body))
+                self.metrics.request(command, time.time() - started,
+                    len(body), error)
+                raise error
+            # The body has not been read yet: record the time to the headers
+            # and the announced length.
+            self.metrics.request(command, time.time() - started,
+                int(response.getheader('content-length', 0) or 0))
+            return response
+
+        # Only opening the page is retried; errors met while reading it are
+        # raised by the collection.
+        if self.retry is None:
+            response = open_page()
+        else:
+            response = self.retry.call(open_page)
+        return StreamingItemCollection(response, item_class, self)
+
     def get_item(self, command, **kwargs):
         # pylint: disable=W0221
         data = self._get_response(command=command, **kwargs)
         return data
 
 
+_default = {'connection': None}
+_default_lock = threading.Lock()
+_thread_default = threading.local()
+
+
+def get_default_connection():
+    """
+    Return the ``APIConnection`` used when no connection is passed to a
+    ``Video``, ``Playlist`` or ``ItemResultSet``.
+
+    A connection set for the current thread with
+    ``set_default_connection(connection, thread_local=True)`` takes
+    precedence; otherwise one process-wide connection is created from the
+    configuration on first use and shared by every thread.
+    """
+    conn = getattr(_thread_default, 'connection', None)
+    if conn is not None:
+        return conn
+    _default_lock.acquire()
+    try:
+        if _default['connection'] is None:
+            _default['connection'] = APIConnection()
+        return _default['connection']
+    finally:
+        _default_lock.release()
+
+
+def set_default_connection(connection, thread_local=False):
+    """
+    Make ``connection`` the default connection for the whole process or, with
+    ``thread_local``, for the current thread only.  Passing None clears it, so
+    the next lookup creates a new one from the configuration.
+    """
+    if thread_local:
+        _thread_default.connection = connection
+        return
+    _default_lock.acquire()
+    try:
+        _default['connection'] = connection
+    finally:
+        _default_lock.release()
+
+
+class AsyncAPIConnection(object):
+    """
+    Non-blocking front end to an ``APIConnection``.
+
+    Each call is queued on a fixed size pool of worker threads shared by every
+    request made through this object and returns immediately with a
+    ``multiprocessing.pool.AsyncResult``; call ``get()`` on it to wait for the
+    result, or pass ``callback`` to be called with the result once it is
+    available.  Errors raised by the API are re-raised by ``get()``.
+    """
+
+    def __init__(self, connection=None, workers=10, **kwargs):
+        if connection:
+            self.connection = connection
+        else:
+            self.connection = APIConnection(**kwargs)
+        self._pool = ThreadPool(workers)
+
+    def _submit(self, func, args, kwargs, callback):
+        return self._pool.apply_async(func, args, kwargs, callback)
+
+    def get_item(self, command, callback=None, **kwargs):
+        """
+        Asynchronous ``APIConnection.get_item``.
+        """
+        return self._submit(self.connection.get_item, (command, ), kwargs,
+            callback)
+
+    def get_list(self, command, item_class, page_size, page_number, sort_by,
+        sort_order, callback=None, **kwargs):
+        """
+        Asynchronous ``APIConnection.get_list``.
+        """
+        # pylint: disable=R0913
+        return self._submit(self.connection.get_list, (command, item_class,
+            page_size, page_number, sort_by, sort_order), kwargs, callback)
+
+    def post(self, command, file_to_upload=None, callback=None, **kwargs):
+        """
+        Asynchronous ``APIConnection.post``.
+        """
+        return self._submit(self.connection.post, (command, file_to_upload),
+            kwargs, callback)
+
+    def find_video(self, callback=None, **kwargs):
+        """
+        Asynchronously look up a ``Video`` by ``id`` or ``reference_id``.
+        """
+        from pybrightcove.video import Video
+        kwargs['_connection'] = self.connection
+        return self._submit(Video, (), kwargs, callback)
+
+    def find_playlist(self, callback=None, **kwargs):
+        """
+        Asynchronously look up a ``Playlist`` by ``id`` or ``reference_id``.
+        """
+        from pybrightcove.playlist import Playlist
+        kwargs['connection'] = self.connection
+        return self._submit(Playlist, (), kwargs, callback)
+
+    def list(self, result_set, callback=None):
+        """
+        Asynchronously iterate an ``ItemResultSet`` (as returned by the
+        ``Video.find_*`` and ``Playlist.find_*`` methods) into a list.
+        """
+        return self._submit(list, (result_set, ), {}, callback)
+
+    def close(self):
+        """
+        Stop the worker threads once the queued requests have completed.
+        """
+        self._pool.close()
+        self._pool.join()
+
+
 def item_lister(command, _connection, page_size, page_number, sort_by,
     sort_order, item_class, result_set, **kwargs):
     """
@@ -285,41 +882,208 @@ def item_lister(command, _connection, page_size, page_number, sort_by,
     """
     # pylint: disable=R0913
     page = page_number
+    get_list = _connection.get_list
+    if getattr(result_set, 'stream', False):
+        get_list = _connection.stream_list
     while True:
-        item_collection = _connection.get_list(command,
-                                             page_size=page_size,
-                                             page_number=page,
-                                             sort_by=sort_by,
-                                             sort_order=sort_order,
-                                             item_class=item_class,
-                                             **kwargs)
+        item_collection = get_list(command,
+                                   page_size=page_size,
+                                   page_number=page,
+                                   sort_by=sort_by,
+                                   sort_order=sort_order,
+                                   item_class=item_class,
+                                   **kwargs)
+        result_set.pages += 1
         result_set.total_count = item_collection.total_count
         result_set.page_number = page
+        count = 0
         for item in item_collection.items:
+            count += 1
             yield item
+        # A streamed page only knows its counts once it has been read.
+        result_set.total_count = item_collection.total_count
         if item_collection.total_count < 0 or item_collection.page_size == 0:
             break
-        if len(item_collection.items) > 0:
+        if count > 0:
             page += 1
         else:
             break
 
 
+def prefetch_item_lister(command, _connection, page_size, page_number,
+    sort_by, sort_order, item_class, result_set, workers, **kwargs):
+    """
+    A generator function for listing Video and Playlist objects that fetches
+    pages concurrently.
+
+    The first page is fetched on the calling thread to learn ``total_count``,
+    the remaining pages are then fetched by ``workers`` threads.  At most
+    ``workers`` pages are requested ahead of the page being consumed, and items
+    are yielded in the same order as ``item_lister`` would yield them.
+    """
+    # pylint: disable=R0913,R0914
+    fetched = []
+
+    def fetch(page):
+        collection = _connection.get_list(command,
+                                          page_size=page_size,
+                                          page_number=page,
+                                          sort_by=sort_by,
+                                          sort_order=sort_order,
+                                          item_class=item_class,
+                                          **kwargs)
+        fetched.append(page)
+        return collection
+
+    try:
+        item_collection = fetch(page_number)
+        result_set.total_count = item_collection.total_count
+        result_set.page_number = page_number
+        for item in item_collection.items:
+            yield item
+        if item_collection.total_count < 0 or \
+            item_collection.page_size == 0 or len(item_collection.items) == 0:
+            return
+
+        last_page = (item_collection.total_count - 1) // page_size
+        pages = iter(range(page_number + 1, last_page + 1))
+        page = page_number
+        pool = ThreadPool(workers)
+        try:
+            pending = collections.deque()
+            for next_page in itertools.islice(pages, workers):
+                pending.append(
+                    (next_page, pool.apply_async(fetch, (next_page,))))
+            while pending:
+                page, result = pending.popleft()
+                item_collection = result.get()
+                for next_page in itertools.islice(pages, 1):
+                    pending.append(
+                        (next_page, pool.apply_async(fetch, (next_page,))))
+                result_set.total_count = item_collection.total_count
+                result_set.page_number = page
+                for item in item_collection.items:
+                    yield item
+                if len(item_collection.items) == 0:
+                    return
+        finally:
+            pool.terminate()
+    finally:
+        # Pages fetched ahead but never consumed are counted as well.
+        result_set.pages += len(fetched)
+
+    # The catalog may have grown since the first page was fetched, so carry on
+    # serially until an empty page is returned, as item_lister does.
+    for item in item_lister(command, _connection, page_size, page + 1,
+        sort_by, sort_order, item_class, result_set, **kwargs):
+        yield item
+
+
+ADAPTIVE_PAGE_SIZES = (1, 5, 10, 25, 50, 100)
+ADAPTIVE_SLOW_CALL = 10.0
+ADAPTIVE_FAST_CALL = 2.0
+
+
+def adaptive_item_lister(command, _connection, page_size, page_number,
+    sort_by, sort_order, item_class, result_set, page_sizes=None, slow=None,
+    fast=None, **kwargs):
+    """
+    A generator function for listing Video and Playlist objects that adapts
+    the page size to the time the API takes to answer.
+
+    The page size is picked from ``page_sizes``, to which ``page_size`` and
+    1 are added, starting from ``page_size``.  A page that fails with a
+    ``CallTimeoutError`` is fetched again with the next smaller size, a page
+    that takes more than ``slow`` seconds makes the next ones smaller and a
+    page that takes less than ``fast`` seconds makes them larger.  A size that
+    timed out, and every larger one, is not used again.  Listing
+    tracks the offset of the next item, and a size is only used once the
+    offset is a multiple of it, so that the offset maps to a page number
+    and no item is skipped or repeated when the size changes.
+    """
+    # pylint: disable=R0913,R0914
+    # page_size divides the starting offset and 1 divides every offset, so
+    # there is always a size in the ladder to fetch the next item with.
+    sizes = sorted(set(page_sizes or ADAPTIVE_PAGE_SIZES) |
+        set([1, page_size]))
+    slow = slow or ADAPTIVE_SLOW_CALL
+    fast = fast or ADAPTIVE_FAST_CALL
+    target = sizes.index(page_size)
+    # Index of the smallest size that timed out; pages never grow to it.
+    ceiling = len(sizes)
+    offset = page_number * page_size
+    # A page that timed out is fetched again with a smaller size rather than
+    # retried at the same size by the retry policy of the connection.
+    no_retry = (exceptions.CallTimeoutError, )
+    while True:
+        size = [candidate for candidate in sizes[:target + 1]
+            if offset % candidate == 0][-1]
+        started = time.time()
+        try:
+            item_collection = _connection.get_list(command,
+                                                   page_size=size,
+                                                   page_number=offset // size,
+                                                   sort_by=sort_by,
+                                                   sort_order=sort_order,
+                                                   item_class=item_class,
+                                                   _no_retry=no_retry,
+                                                   **kwargs)
+        except exceptions.CallTimeoutError:
+            result_set.pages += 1
+            if sizes[0] == size:
+                raise
+            ceiling = min(ceiling, sizes.index(size))
+            target = ceiling - 1
+            continue
+        elapsed = time.time() - started
+        result_set.pages += 1
+        result_set.total_count = item_collection.total_count
+        if elapsed > slow:
+            target = max(sizes.index(size) - 1, 0)
+        elif elapsed < fast:
+            target = min(target + 1, ceiling - 1)
+        count = 0
+        for item in item_collection.items:
+            count += 1
+            yield item
+        if item_collection.total_count < 0 or item_collection.page_size == 0:
+            break
+        if count > 0:
+            offset += size
+        else:
+            break
+
+
 class ItemResultSet(object):
     """
     An object to provide an interator facility to the paging calls to the API.
+
+    Setting ``workers`` to more than one fetches the pages following the first
+    one concurrently with that many threads.  Setting ``stream`` decodes each
+    page incrementally as it is read off the connection instead of loading it
+    whole (see ``StreamingItemCollection``); ``stream`` is ignored when
+    ``workers`` is more than one.  Setting ``lazy`` builds item classes that
+    support it with ``lazy_load``, deferring the decoding of each attribute
+    until it is first read.  Setting ``adaptive`` lists the items with
+    ``adaptive_item_lister``, which changes the page size as it goes, and
+    ignores ``workers`` and ``stream``; ``page_size`` is then the size of the
+    first page, and ``page_number`` is not updated.
+
+    ``pages`` counts the pages fetched by the current iteration; the count is
+    reported to the ``metrics`` of the connection when the iteration ends.
     """
     # pylint: disable=R0903,R0902
 
     def __init__(self, command, item_class, _connection=None, page_size=100,
             page_number=0, sort_by=enums.DEFAULT_SORT_BY,
-            sort_order=enums.DEFAULT_SORT_ORDER, **kwargs):
+            sort_order=enums.DEFAULT_SORT_ORDER, workers=1, stream=False,
+            lazy=False, adaptive=False, **kwargs):
         # pylint: disable=R0913
         self.command = command
         if _connection:
             self._connection = _connection
         else:
-            self._connection = APIConnection()
+            self._connection = get_default_connection()
         self.page_size = page_size
         self.page_number = page_number
         self.sort_by = sort_by
@@ -327,20 +1091,161 @@ class ItemResultSet(object):
         self.item_class = item_class
         self.kwargs = kwargs
         self.total_count = None
+        self.workers = workers
+        self.stream = stream
+        self.lazy = lazy
+        self.adaptive = adaptive
+        self.pages = 0
+
+    def _record_pages(self, items):
+        """
+        Report the number of pages fetched by an iteration to the metrics of
+        the connection once it is over.
+        """
+        self.pages = 0
+        try:
+            for item in items:
+                yield item
+        finally:
+            metrics = getattr(self._connection, 'metrics', None)
+            if isinstance(metrics, Metrics):
+                metrics.pages(self.command, self.pages)
+
+    def __iter__(self):
+        item_class = self.item_class
+        if self.lazy and hasattr(item_class, 'lazy_load'):
+            item_class = item_class.lazy_load
+        if self.adaptive:
+            items = adaptive_item_lister(self.command, self._connection,
+                self.page_size, self.page_number, self.sort_by,
+                self.sort_order, item_class, self, **self.kwargs)
+        elif self.workers > 1:
+            items = prefetch_item_lister(self.command, self._connection,
+                self.page_size, self.page_number, self.sort_by,
+                self.sort_order, item_class, self, self.workers,
+                **self.kwargs)
+        else:
+            items = item_lister(self.command, self._connection,
+                self.page_size, self.page_number, self.sort_by,
+                self.sort_order, item_class, self, **self.kwargs)
+        return self._record_pages(items)
+
+
+def chunk_ids(ids, chunk_size, max_length):
+    """
+    Split ``ids`` into lists of at most ``chunk_size`` ids whose comma joined
+    form is at most ``max_length`` characters long once URL encoded, keeping
+    the input order.
+    """
+    separator = len(urllib.quote_plus(','))
+    chunks = []
+    chunk = []
+    length = 0
+    for i in ids:
+        i = str(i)
+        size = len(urllib.quote_plus(i))
+        if chunk and (len(chunk) >= chunk_size or
+                      length + separator + size > max_length):
+            chunks.append(chunk)
+            chunk = []
+            length = 0
+        if chunk:
+            length += separator
+        length += size
+        chunk.append(i)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class BatchItemResultSet(object):
+    """
+    An ``ItemResultSet`` for the ``find_*_by_ids`` and
+    ``find_*_by_reference_ids`` commands that accepts any number of ids.
+
+    The ids are split into chunks small enough to fit in a URL and the chunks
+    are fetched concurrently by ``workers`` threads.  Chunks are yielded in
+    input order, and the items of each chunk are ordered like the ids that
+    were asked for; items whose ``key_attr`` does not match any requested id
+    follow in the order the API returned them.  ``page_number`` skips the
+    first ``page_number * page_size`` items of the merged result.
+    """
+    # pylint: disable=R0903,R0902
+
+    def __init__(self, command, item_class, id_param, ids, key_attr,
+            _connection=None, page_size=100, page_number=0,
+            sort_by=enums.DEFAULT_SORT_BY,
+            sort_order=enums.DEFAULT_SORT_ORDER, chunk_size=50,
+            max_length=2000, workers=4):
+        # pylint: disable=R0913
+        self.command = command
+        if _connection:
+            self._connection = _connection
+        else:
+            self._connection = get_default_connection()
+        self.item_class = item_class
+        self.id_param = id_param
+        self.key_attr = key_attr
+        self.page_size = page_size
+        self.page_number = page_number
+        self.sort_by = sort_by
+        self.sort_order = sort_order
+        self.chunks = chunk_ids(ids, chunk_size, max_length)
+        self.workers = workers
+        self.total_count = None
+
+    def _fetch(self, chunk):
+        result_set = ItemResultSet(self.command, self.item_class,
+            self._connection, self.page_size, 0, self.sort_by,
+            self.sort_order, **{self.id_param: ','.join(chunk)})
+        items = list(result_set)
+        position = dict([(key, i) for i, key in enumerate(chunk)])
+        default = len(chunk)
+        items.sort(key=lambda item: position.get(
+            str(getattr(item, self.key_attr, None)), default))
+        return result_set.total_count, items
+
+    def _results(self):
+        if len(self.chunks) < 2 or self.workers < 2:
+            for chunk in self.chunks:
+                yield self._fetch(chunk)
+            return
+        chunks = iter(self.chunks)
+        pool = ThreadPool(self.workers)
+        try:
+            pending = collections.deque()
+            for chunk in itertools.islice(chunks, self.workers):
+                pending.append(pool.apply_async(self._fetch, (chunk,)))
+            while pending:
+                result = pending.popleft().get()
+                for chunk in itertools.islice(chunks, 1):
+                    pending.append(pool.apply_async(self._fetch, (chunk,)))
+                yield result
+        finally:
+            pool.terminate()
 
     def __iter__(self):
-        return item_lister(self.command, self._connection, self.page_size,
-            self.page_number, self.sort_by, self.sort_order, self.item_class,
-            self, **self.kwargs)
+        self.total_count = 0
+        skip = self.page_number * self.page_size
+        for total_count, items in self._results():
+            self.total_count += max(total_count or 0, 0)
+            if skip >= len(items):
+                skip -= len(items)
+                continue
+            for item in items[skip:]:
+                yield item
+            skip = 0
 
 
 class ItemCollection(object):
     """
     The object that represents a collection of domain objects from the API.
+    With ``lazy`` set, item classes that support it are built with
+    ``lazy_load``.
     """
     # pylint: disable=R0903
 
-    def __init__(self, data, item_class, _connection=None):
+    def __init__(self, data, item_class, _connection=None, lazy=False):
         self.total_count = None
         self.items = None
         self.page_number = None
@@ -351,6 +1256,140 @@ class ItemCollection(object):
         self.total_count = int(data['total_count'])
         self.page_number = int(data['page_number'])
         self.page_size = int(data['page_size'])
+        if lazy and hasattr(item_class, 'lazy_load'):
+            item_class = item_class.lazy_load
         for item in data['items']:
             if item is not None:  # @@@ Not sure why but the Media API sometimes returns None for items in the list
                 self.items.append(item_class(data=item, _connection=_connection))
+
+
+class StreamingItemCollection(object):
+    """
+    A page of domain objects decoded incrementally from the API response.
+
+    ``items`` is a generator that yields each object as soon as it has been
+    decoded, so only one item is held in memory at a time.  The Media API
+    usually sends ``total_count``, ``page_number`` and ``page_size`` after the
+    items, so these are None until ``items`` has been consumed.
+    """
+    # pylint: disable=R0903
+
+    def __init__(self, response, item_class, _connection=None,
+        chunk_size=65536):
+        self.total_count = None
+        self.page_number = None
+        self.page_size = None
+        self.items = self._items(response, item_class, _connection,
+            chunk_size)
+
+    def _items(self, response, item_class, _connection, chunk_size):
+        try:
+            for key, value in JSONStream(response, chunk_size).members(
+                'items'):
+                if key == 'items':
+                    if value is not None:
+                        yield item_class(data=value, _connection=_connection)
+                elif key == 'error' and value:
+                    exceptions.BrightcoveError.raise_exception(value)
+                elif key in ('total_count', 'page_number', 'page_size'):
+                    setattr(self, key, int(value))
+                elif key is None and value is None:
+                    raise exceptions.NoDataFoundError("No data found")
+        finally:
+            response.close()
+
+
+class JSONStream(object):
+    """
+    Incremental decoder for a JSON object read from a file-like object.
+    """
+
+    def __init__(self, fp, chunk_size=65536):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = simplejson.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """
+        Return the next non-whitespace character, or None at the end.
+        """
+        while True:
+            while self.pos < len(self.buf) and \
+                self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char is None or char not in chars:
+            raise ValueError("Malformed JSON: expected %r at %r" %
+                (chars, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+        return char
+
+    def _value(self):
+        while True:
+            self._peek()
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self._fill():
+                    continue
+                raise
+            # A number may continue in the next chunk ("1" of "1.5"), so
+            # only accept one once a delimiter or the end of input follows.
+            if isinstance(value, (int, long, float)) and not self.eof and \
+                (end == len(self.buf) or
+                 self.buf[end] not in ',]} \t\r\n'):
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def members(self, array_key):
+        """
+        Yield the ``(key, value)`` pairs of the top level object.  The array
+        stored under ``array_key`` is yielded one ``(array_key, element)``
+        pair per element.  A top level value that is not an object is yielded
+        as ``(None, value)``.
+        """
+        if self._peek() != '{':
+            yield None, self._value()
+            return
+        self.pos += 1
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == array_key and self._peek() == '[':
+                self.pos += 1
+                if self._peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield key, self._value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                yield key, self._value()
+            if self._expect(',}') == '}':
+                return
@@ -36,6 +36,10 @@ class NoDataFoundError(PyBrightcoveError):
         super(NoDataFoundError, self).__init__(reason)
 
 
+class IncompleteUploadError(PyBrightcoveError):
+    pass
+
+
 class BrightcoveError(Exception):
     description = "a general error"
 
@@ -0,0 +1,130 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Declarative validation for the attributes of the slot based domain objects.
+
+A class lists the constraints on its attributes in a ``_fields`` dictionary
+and is passed to ``compile_fields`` once it has been defined.  The slot of
+each constrained attribute is then wrapped in a ``ValidatedSlot`` that checks
+values on assignment, while unconstrained attributes keep their plain slot and
+are assigned without any Python level overhead.  Data that comes from the API
+is trusted and can be stored without validation with the setters in the
+class's ``_raw_setters`` dictionary.
+"""
+
+from pybrightcove import enums
+from pybrightcove import exceptions
+
+
+# The most unicode values, other than enum values, shared by intern_value
+# before its table is emptied.
+INTERN_LIMIT = 10000
+
+_ENUM_VALUES = dict([(unicode(value), unicode(value))
+    for enum in vars(enums).values() if isinstance(enum, type)
+    for name, value in vars(enum).items()
+    if name.isupper() and isinstance(value, str)])
+_interned = {}
+
+
+def intern_value(value):
+    """
+    Return a shared copy of a string decoded from the API that is repeated
+    across many objects, such as an enum value or a tag.  Byte strings use
+    the builtin ``intern``, which frees them once they are no longer used.
+    Unicode enum values are always shared, and other unicode values through
+    a table of at most ``INTERN_LIMIT`` values, so that long crawls do not
+    grow it without bound.
+    """
+    if isinstance(value, str):
+        return intern(value)
+    if isinstance(value, unicode):
+        shared = _ENUM_VALUES.get(value)
+        if shared is not None:
+            return shared
+        if len(_interned) >= INTERN_LIMIT:
+            _interned.clear()
+        return _interned.setdefault(value, value)
+    return value
+
+
+def max_length(length, message):
+    """
+    Constraint for values of at most ``length`` items or characters.
+    """
+    return (lambda value: len(value) <= length, message)
+
+
+def one_of(choices, message):
+    """
+    Constraint for values that must be one of ``choices``.
+    """
+    choices = tuple(choices)
+    return (lambda value: value in choices, message)
+
+
+def instance_of(types, message):
+    """
+    Constraint for values that must be instances of ``types``.
+    """
+    return (lambda value: isinstance(value, types), message)
+
+
+class ValidatedSlot(object):
+    """
+    A data descriptor that validates values before storing them in a slot.
+    As before, empty values (None, '', 0, []) are never validated.
+    """
+    __slots__ = ('slot', 'check', 'message')
+
+    def __init__(self, slot, check, message):
+        self.slot = slot
+        self.check = check
+        self.message = message
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return self.slot.__get__(obj, objtype)
+
+    def __set__(self, obj, value):
+        if value and not self.check(value):
+            raise exceptions.PyBrightcoveError(self.message)
+        self.slot.__set__(obj, value)
+
+    def __delete__(self, obj):
+        self.slot.__delete__(obj)
+
+
+def compile_fields(cls):
+    """
+    Install a ``ValidatedSlot`` for every attribute constrained in
+    ``cls._fields`` and build ``cls._raw_setters``, mapping every slot to a
+    function that stores a value without validating it.  Returns ``cls``.
+    """
+    raw_setters = {}
+    for name in cls.__slots__:
+        slot = cls.__dict__[name]
+        raw_setters[name] = slot.__set__
+        if name in cls._fields:
+            check, message = cls._fields[name]
+            setattr(cls, name, ValidatedSlot(slot, check, message))
+    cls._raw_setters = raw_setters
+    return cls
@@ -34,12 +34,18 @@ __author__ = 'j.s@google.com (Jeff Scudder)'
 
 
 import os
+import sys
 import stat
+import time
+import errno
+import select
+import socket
 import StringIO
 import urlparse
 import urllib
 import httplib
 import mimetypes
+import threading
 
 
 class Error(Exception):
@@ -86,26 +92,41 @@ class HttpRequest(object):
     self.headers['MIME-version'] = '1.0'
     self.headers['Connection'] = 'close'
 
-  def add_body_part(self, key, data, mime_type, size=None):
+  def add_body_part(self, key, data, mime_type, size=None, filename=None):
     """Adds data to the HTTP request body.
    
     If more than one part is added, this is assumed to be a mime-multipart
     request. This method is designed to create MIME 1.0 requests as specified
     in RFC 1341.
 
+    A part whose size is not known, such as a pipe, a socket file or an
+    iterator of strings, switches the request to chunked transfer encoding.
+
     Args:
-      data: str or a file-like object containing a part of the request body.
+      data: str, a file-like object or an iterable of str containing a part
+            of the request body.
       mime_type: str The MIME type describing the data
-      size: int Required if the data is a file like object. If the data is a
-            string, the size is calculated so this parameter is ignored.
+      size: int The size of a file-like object or iterable, if known. If the
+            data is a string or a regular file, the size is calculated so this
+            parameter is ignored.
+      filename: str The file name sent for the part. Defaults to the name of
+                the file for objects with a fileno.
     """
     if isinstance(data, str):
       size = len(data)
-    if hasattr(data, "fileno"):
-      size = os.fstat(data.fileno())[stat.ST_SIZE]
+    elif hasattr(data, "fileno"):
+      try:
+        st = os.fstat(data.fileno())
+        if stat.S_ISREG(st[stat.ST_MODE]):
+          size = st[stat.ST_SIZE]
+      except (AttributeError, TypeError, ValueError, IOError, OSError):
+        pass
+      if filename is None and hasattr(data, "name"):
+        filename = data.name.split('/')[-1]
     if size is None:
-      # TODO: support chunked transfer if some of the body is of unknown size.
-      raise UnknownSize('Each part of the body must have a known size.')
+      self.headers['Transfer-Encoding'] = 'chunked'
+      self.headers.pop('Content-Length', None)
+    chunked = self.headers.get('Transfer-Encoding') == 'chunked'
     if 'Content-Length' in self.headers:
       content_length = int(self.headers['Content-Length'])
     else:
@@ -114,23 +135,26 @@ class HttpRequest(object):
     # request.
     boundary_string = '\r\n--%s\r\n' % (MIME_BOUNDARY,)
     self._body_parts.append(boundary_string)
-    content_length += len(boundary_string) + size
+    content_length += len(boundary_string) + (size or 0)
     # Include the mime type of this part.
     cd = 'Content-Disposition: form-data; name="%s"' % key
     mt = mime_type
-    if hasattr(data, "fileno"):
-        cd += '; filename="%s"' % data.name.split('/')[-1]
-        mt = mimetypes.guess_type(data.name)[0] or 'application/octet-stream'
+    if filename:
+        cd += '; filename="%s"' % filename
+        mt = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
     cd += '\r\n'
     type_string = 'Content-Type: %s\r\n\r\n' % (mt)
     self._body_parts.append(cd)
     self._body_parts.append(type_string)
     content_length += len(type_string) + len(cd)
     self._body_parts.append(data)
-    self.headers['Content-Length'] = str(content_length)
+    if not chunked:
+      self.headers['Content-Length'] = str(content_length)
 
   def end_of_parts(self):
     self._body_parts.append('\r\n--%s--' % (MIME_BOUNDARY,))
+    if self.headers.get('Transfer-Encoding') == 'chunked':
+      return
     content_length = int(self.headers['Content-Length'])
     content_length += len('\r\n--%s--' % (MIME_BOUNDARY,))
     self.headers['Content-Length'] = str(content_length)
@@ -146,11 +170,15 @@ class HttpRequest(object):
 
 
 def _apply_defaults(http_request):
-  if http_request.uri.scheme is None:
-    if http_request.uri.port == 443:
-      http_request.uri.scheme = 'https'
+  _apply_defaults_to_uri(http_request.uri)
+
+
+def _apply_defaults_to_uri(uri):
+  if uri.scheme is None:
+    if uri.port == 443:
+      uri.scheme = 'https'
     else:
-      http_request.uri.scheme = 'http'
+      uri.scheme = 'http'
 
 
 class Uri(object):
@@ -397,12 +425,87 @@ class HttpClient(object):
 
     # If there is data, send it in the request.
     if body_parts:
-      for part in body_parts:
-        _send_data_part(part, connection)
+      _send_body(body_parts, headers, connection)
 
     # Return the HTTP Response from the server.
     return connection.getresponse()
 
+def _load_sendfile():
+  """Returns a sendfile(out_fd, in_fd, offset, count) function or None.
+
+  Python 2 has no os.sendfile, so on Linux the libc call is used through
+  ctypes.
+  """
+  if hasattr(os, 'sendfile'):
+    return os.sendfile
+  if not sys.platform.startswith('linux'):
+    return None
+  try:
+    import ctypes
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc_sendfile = libc.sendfile64
+  except (ImportError, OSError, AttributeError):
+    return None
+  libc_sendfile.restype = ctypes.c_ssize_t
+  libc_sendfile.argtypes = [ctypes.c_int, ctypes.c_int,
+                            ctypes.POINTER(ctypes.c_int64), ctypes.c_size_t]
+
+  def sendfile(out_fd, in_fd, offset, count):
+    offset = ctypes.c_int64(offset)
+    sent = libc_sendfile(out_fd, in_fd, ctypes.byref(offset), count)
+    if sent < 0:
+      err = ctypes.get_errno()
+      raise OSError(err, os.strerror(err))
+    return sent
+  return sendfile
+
+
+SENDFILE = _load_sendfile()
+SEND_BUFFER_SIZE = 1024 * 1024
+
+
+def _sendfile_part(data, connection):
+  """Sends the rest of the file data with sendfile.
+
+  Returns False, having sent nothing, when the part or the connection does
+  not allow it: sendfile needs a regular file and a plain TCP socket, as TLS
+  has to encrypt the data in Python.
+  """
+  if SENDFILE is None or isinstance(connection, httplib.HTTPSConnection):
+    return False
+  sock = getattr(connection, 'sock', None)
+  if sock is None or connection.debuglevel > 0:
+    return False
+  try:
+    in_fd = data.fileno()
+    out_fd = sock.fileno()
+    offset = data.tell()
+    size = os.fstat(in_fd).st_size
+  except (AttributeError, TypeError, ValueError, IOError, OSError,
+          socket.error):
+    return False
+  if not isinstance(in_fd, int) or not isinstance(out_fd, int):
+    return False
+  # A socket with a timeout is non-blocking underneath, so sendfile may
+  # return EAGAIN; wait until it is writable again in that case.
+  timeout = sock.gettimeout()
+  sent = offset
+  while sent < size:
+    try:
+      count = SENDFILE(out_fd, in_fd, sent, size - sent)
+    except OSError, e:
+      if e.errno not in (errno.EAGAIN, errno.EINTR):
+        raise socket.error(e.errno, e.strerror)
+      if not select.select([], [sock], [], timeout)[1]:
+        raise socket.timeout('timed out')
+      continue
+    if count == 0:
+      break
+    sent += count
+  data.seek(sent)
+  return True
+
+
 def _send_data_part(data, connection):
   if isinstance(data, (str, unicode)):
     # I might want to just allow str, not unicode.
@@ -410,10 +513,25 @@ def _send_data_part(data, connection):
     return
   # Check to see if data is a file-like object that has a read method.
   elif hasattr(data, 'read'):
-    # Read the file and send it a chunk at a time.
+    if _sendfile_part(data, connection):
+      return
+    # Read the file and send it a chunk at a time, reusing one buffer when
+    # the file supports readinto.
+    if hasattr(type(data), 'readinto'):
+      buf = bytearray(SEND_BUFFER_SIZE)
+      view = memoryview(buf)
+      while 1:
+        count = data.readinto(buf)
+        if not count: break
+        connection.send(view[:count])
+      return
     while 1:
-      binarydata = data.read(100000)
-      if binarydata == '': break
+      binarydata = data.read(SEND_BUFFER_SIZE)
+      if not binarydata: break
+      connection.send(binarydata)
+    return
+  elif hasattr(data, '__iter__'):
+    for binarydata in data:
       connection.send(binarydata)
     return
   else:
@@ -423,6 +541,38 @@ def _send_data_part(data, connection):
     return
 
 
+def _send_body(body_parts, headers, connection):
+  """Sends the body parts, as chunks if the request is chunked."""
+  if headers.get('Transfer-Encoding') != 'chunked':
+    for part in body_parts:
+      _send_data_part(part, connection)
+    return
+  for part in body_parts:
+    _send_chunked_part(part, connection)
+  connection.send('0\r\n\r\n')
+
+
+def _send_chunk(data, connection):
+  if data:
+    connection.send('%x\r\n%s\r\n' % (len(data), data))
+
+
+def _send_chunked_part(data, connection):
+  """Sends a body part as one or more chunks of a chunked request body."""
+  if isinstance(data, (str, unicode)):
+    _send_chunk(data, connection)
+  elif hasattr(data, 'read'):
+    while 1:
+      binarydata = data.read(SEND_BUFFER_SIZE)
+      if not binarydata: break
+      _send_chunk(binarydata, connection)
+  elif hasattr(data, '__iter__'):
+    for binarydata in data:
+      _send_chunk(binarydata, connection)
+  else:
+    _send_chunk(str(data), connection)
+
+
 class ProxiedHttpClient(HttpClient):
 
   def _get_connection(self, uri, headers=None):
@@ -497,3 +647,278 @@ def _get_proxy_auth():
     return 'Basic %s\r\n' % (user_auth.strip())
   else:
     return ''
+
+
+class ConnectionPool(object):
+  """Keeps idle keep-alive connections open for reuse.
+
+  Connections are grouped by (scheme, host, port).  At most max_size idle
+  connections are kept per group, connections idle for longer than
+  idle_timeout seconds are closed rather than reused, and every connection is
+  health checked before it is handed out again.  Checking out a connection
+  never blocks: when no healthy idle connection is available, a new one is
+  opened.
+
+  The pool is safe to share between threads.
+  """
+
+  def __init__(self, max_size=10, idle_timeout=60):
+    """Construct a connection pool.
+
+    Args:
+      max_size: int The maximum number of idle connections kept per
+                (scheme, host, port).
+      idle_timeout: int or float Number of seconds after which an idle
+                    connection is evicted instead of reused.
+    """
+    self.max_size = max_size
+    self.idle_timeout = idle_timeout
+    self._idle = {}
+    self._lock = threading.Lock()
+
+  def _key(self, uri):
+    scheme = uri.scheme or 'http'
+    port = uri.port
+    if not port:
+      if scheme == 'https':
+        port = 443
+      else:
+        port = 80
+    return (scheme, uri.host, int(port))
+
+  def get(self, uri):
+    """Returns a healthy idle connection for uri, or None."""
+    key = self._key(uri)
+    now = time.time()
+    while True:
+      self._lock.acquire()
+      try:
+        idle = self._idle.get(key)
+        if not idle:
+          return None
+        connection, released_at = idle.pop()
+      finally:
+        self._lock.release()
+      if (now - released_at < self.idle_timeout and
+          _is_connection_alive(connection)):
+        return connection
+      connection.close()
+
+  def put(self, uri, connection):
+    """Returns a connection to the pool once its response has been read."""
+    key = self._key(uri)
+    self._lock.acquire()
+    try:
+      idle = self._idle.setdefault(key, [])
+      if len(idle) < self.max_size:
+        idle.append((connection, time.time()))
+        return
+    finally:
+      self._lock.release()
+    connection.close()
+
+  def evict_idle(self):
+    """Closes every connection that has been idle for too long."""
+    now = time.time()
+    expired = []
+    self._lock.acquire()
+    try:
+      for key, idle in self._idle.items():
+        fresh = []
+        for connection, released_at in idle:
+          if now - released_at < self.idle_timeout:
+            fresh.append((connection, released_at))
+          else:
+            expired.append(connection)
+        self._idle[key] = fresh
+    finally:
+      self._lock.release()
+    for connection in expired:
+      connection.close()
+
+  def clear(self):
+    """Closes all idle connections."""
+    self._lock.acquire()
+    try:
+      idle, self._idle = self._idle, {}
+    finally:
+      self._lock.release()
+    for connections in idle.values():
+      for connection, released_at in connections:
+        connection.close()
+
+  def size(self):
+    """Returns the number of idle connections currently held."""
+    self._lock.acquire()
+    try:
+      return sum([len(idle) for idle in self._idle.values()])
+    finally:
+      self._lock.release()
+
+
+def _is_connection_alive(connection):
+  """Checks that an idle connection has not been closed by the server.
+
+  An idle keep-alive socket should have nothing to read; if select reports it
+  as readable the server has either closed it or sent unsolicited data, and
+  in both cases it can not be reused.
+  """
+  sock = getattr(connection, 'sock', None)
+  if sock is None:
+    return False
+  try:
+    readable = select.select([sock], [], [], 0)[0]
+  except (select.error, socket.error, TypeError, ValueError):
+    return False
+  return not readable
+
+
+DEFAULT_POOL = ConnectionPool()
+
+
+class _StaleConnection(Exception):
+  """Raised when a pooled connection turns out to have been closed."""
+
+
+class PooledHttpClient(ProxiedHttpClient):
+  """Performs HTTP requests over keep-alive connections from a pool.
+
+  The response body is read completely before the connection is returned to
+  the pool, so the HttpResponse objects returned by this client hold the body
+  in memory.
+  """
+
+  def __init__(self, pool=None):
+    self.pool = pool or DEFAULT_POOL
+
+  def stream(self, http_request):
+    """Sends a request and returns a PooledResponse without reading its body.
+
+    The connection goes back to the pool once the body has been read to the
+    end; closing the response before that closes the connection.
+    """
+    return self._http_request(http_request.method, http_request.uri,
+                              http_request.headers, http_request._body_parts,
+                              stream=True)
+
+  def _http_request(self, method, uri, headers=None, body_parts=None,
+                    stream=False):
+    if isinstance(uri, (str, unicode)):
+      uri = Uri.parse_uri(uri)
+    _apply_defaults_to_uri(uri)
+    headers = headers or {}
+    headers['Connection'] = 'keep-alive'
+    connection = self.pool.get(uri)
+    if connection is not None:
+      # The server may close an idle keep-alive connection at any time, so a
+      # GET that fails on a pooled connection because it was closed is sent
+      # once more on a new one.  Other requests are never resent, as the
+      # server may have acted on them.
+      replay = method == 'GET' and _is_replayable(body_parts)
+      try:
+        return self._send(connection, method, uri, headers, body_parts,
+                          stream, replay)
+      except _StaleConnection:
+        pass
+    connection = self._get_connection(uri, headers=headers)
+    return self._send(connection, method, uri, headers, body_parts, stream)
+
+  def _send(self, connection, method, uri, headers, body_parts, stream=False,
+            replay=False):
+    """Sends a request and reads its response.
+
+    Args:
+      replay: bool If True, _StaleConnection is raised instead of the error
+              when the connection turns out to have been closed by the
+              server, so that the caller can send the request again on
+              another connection.
+    """
+    if self.debug:
+      connection.debuglevel = 1
+    try:
+      try:
+        if connection.host != uri.host:
+          connection.putrequest(method, str(uri))
+        else:
+          connection.putrequest(method, uri._get_relative_path())
+        for header_name, value in headers.iteritems():
+          connection.putheader(header_name, value)
+        connection.endheaders()
+        if body_parts:
+          _send_body(body_parts, headers, connection)
+        response = connection.getresponse()
+      except (httplib.CannotSendRequest, httplib.BadStatusLine):
+        if replay:
+          raise _StaleConnection()
+        raise
+      except socket.error, e:
+        if replay and e.args and e.args[0] in (errno.EPIPE, errno.ECONNRESET):
+          raise _StaleConnection()
+        raise
+      if stream:
+        return PooledResponse(response, connection, uri, self.pool)
+      body = response.read()
+    except:
+      connection.close()
+      raise
+    if response.will_close is False:
+      self.pool.put(uri, connection)
+    else:
+      connection.close()
+    return HttpResponse(status=response.status, reason=response.reason,
+                        headers=dict(response.getheaders()), body=body)
+
+
+class PooledResponse(object):
+  """An unread response whose connection belongs to a ConnectionPool."""
+
+  def __init__(self, response, connection, uri, pool):
+    self._response = response
+    self._connection = connection
+    self._uri = uri
+    self._pool = pool
+    self.status = response.status
+    self.reason = response.reason
+
+  def getheader(self, name, default=None):
+    return self._response.getheader(name, default)
+
+  def getheaders(self):
+    return dict(self._response.getheaders())
+
+  def read(self, amt=None):
+    if self._connection is None:
+      return ''
+    try:
+      if amt:
+        data = self._response.read(amt)
+      else:
+        data = self._response.read()
+    except:
+      self.close()
+      raise
+    if not amt or not data or self._response.isclosed():
+      self._release()
+    return data
+
+  def _release(self):
+    connection, self._connection = self._connection, None
+    if connection is None:
+      return
+    if self._response.will_close is False:
+      self._pool.put(self._uri, connection)
+    else:
+      connection.close()
+
+  def close(self):
+    """Releases the connection, closing it if the body was not read."""
+    connection, self._connection = self._connection, None
+    if connection is not None:
+      connection.close()
+
+
+def _is_replayable(body_parts):
+  for part in body_parts or []:
+    if not isinstance(part, (str, unicode)):
+      return False
+  return True
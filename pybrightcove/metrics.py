@@ -0,0 +1,234 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Per-command metrics for ``pybrightcove.connection.APIConnection``.  Pass a
+``Metrics`` instance to the connection to record every call made to the
+Media API::
+
+    metrics = PrometheusMetrics()
+    conn = APIConnection(metrics=metrics)
+    ...
+    print metrics.render()
+
+The default ``Metrics`` records nothing.
+"""
+
+import socket
+import threading
+
+from pybrightcove import exceptions
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PAGE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def error_code(error):
+    """
+    The label an exception is recorded under: the Media API error code of a
+    ``BrightcoveError`` and the class name of any other exception.
+    """
+    if isinstance(error, exceptions.BrightcoveError):
+        code = getattr(error, 'code', None)
+        if code is None and isinstance(error.raw_data, dict):
+            code = error.raw_data.get('code')
+        if code is not None:
+            return str(code)
+    return error.__class__.__name__
+
+
+class Metrics(object):
+    """
+    The interface of the metrics recorders.  This base class records nothing.
+    """
+
+    def request(self, command, seconds, size, error=None):
+        """
+        Record a call of ``command`` that took ``seconds`` and returned a
+        response of ``size`` bytes, or failed with the exception ``error``.
+        Calls answered from the response cache are not recorded.
+        """
+        pass
+
+    def pages(self, command, count):
+        """
+        Record that an ``ItemResultSet`` of ``command`` fetched ``count``
+        pages.
+        """
+        pass
+
+
+NULL_METRICS = Metrics()
+
+
+class _Histogram(object):
+    """
+    Cumulative bucket counts, sum and count of the observed values.
+    """
+    # pylint: disable=R0903
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(**labels):
+    items = []
+    for name in sorted(labels):
+        val = str(labels[name]).replace('\\', '\\\\').replace('"', '\\"')
+        items.append('%s="%s"' % (name, val))
+    return '{%s}' % ','.join(items)
+
+
+class PrometheusMetrics(Metrics):
+    """
+    Keeps the metrics in memory and renders them in the Prometheus text
+    exposition format.  Safe to share between threads and connections.
+    """
+
+    def __init__(self, prefix='pybrightcove', latency_buckets=LATENCY_BUCKETS,
+        page_buckets=PAGE_BUCKETS):
+        self.prefix = prefix
+        self.latency_buckets = latency_buckets
+        self.page_buckets = page_buckets
+        self.requests = {}
+        self.errors = {}
+        self.response_bytes = {}
+        self.latency = {}
+        self.page_counts = {}
+        self._lock = threading.Lock()
+
+    def request(self, command, seconds, size, error=None):
+        self._lock.acquire()
+        try:
+            self.requests[command] = self.requests.get(command, 0) + 1
+            self.response_bytes[command] = \
+                self.response_bytes.get(command, 0) + size
+            if command not in self.latency:
+                self.latency[command] = _Histogram(self.latency_buckets)
+            self.latency[command].observe(seconds)
+            if error is not None:
+                key = (command, error_code(error))
+                self.errors[key] = self.errors.get(key, 0) + 1
+        finally:
+            self._lock.release()
+
+    def pages(self, command, count):
+        self._lock.acquire()
+        try:
+            if command not in self.page_counts:
+                self.page_counts[command] = _Histogram(self.page_buckets)
+            self.page_counts[command].observe(count)
+        finally:
+            self._lock.release()
+
+    def _counter(self, lines, name, doc, values):
+        name = '%s_%s' % (self.prefix, name)
+        lines.append('# HELP %s %s' % (name, doc))
+        lines.append('# TYPE %s counter' % name)
+        for key in sorted(values):
+            if isinstance(key, tuple):
+                labels = _labels(command=key[0], code=key[1])
+            else:
+                labels = _labels(command=key)
+            lines.append('%s%s %s' % (name, labels, values[key]))
+
+    def _histogram(self, lines, name, doc, histograms):
+        name = '%s_%s' % (self.prefix, name)
+        lines.append('# HELP %s %s' % (name, doc))
+        lines.append('# TYPE %s histogram' % name)
+        for command in sorted(histograms):
+            histogram = histograms[command]
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append('%s_bucket%s %s' % (name,
+                    _labels(command=command, le=repr(float(bound))), count))
+            lines.append('%s_bucket%s %s' % (name,
+                _labels(command=command, le='+Inf'), histogram.count))
+            lines.append('%s_sum%s %r' % (name, _labels(command=command),
+                float(histogram.total)))
+            lines.append('%s_count%s %s' % (name, _labels(command=command),
+                histogram.count))
+
+    def render(self):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        self._lock.acquire()
+        try:
+            self._counter(lines, 'requests_total',
+                'Media API calls made.', self.requests)
+            self._counter(lines, 'errors_total',
+                'Media API calls that failed, by error code.', self.errors)
+            self._counter(lines, 'response_bytes_total',
+                'Bytes of Media API responses read.', self.response_bytes)
+            self._histogram(lines, 'request_duration_seconds',
+                'Duration of Media API calls.', self.latency)
+            self._histogram(lines, 'result_set_pages',
+                'Pages fetched per ItemResultSet.', self.page_counts)
+        finally:
+            self._lock.release()
+        return '\n'.join(lines) + '\n'
+
+
+class StatsDMetrics(Metrics):
+    """
+    Sends the metrics to a StatsD daemon over UDP as they are recorded.
+    Sending is best effort: network errors are ignored.
+    """
+
+    def __init__(self, host='localhost', port=8125, prefix='pybrightcove'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, lines):
+        try:
+            self._socket.sendto('\n'.join(lines), self.address)
+        except socket.error:
+            pass
+
+    def request(self, command, seconds, size, error=None):
+        name = '%s.%s' % (self.prefix, command)
+        lines = ['%s.requests:1|c' % name,
+                 '%s.duration:%d|ms' % (name, round(seconds * 1000)),
+                 '%s.response_bytes:%d|c' % (name, size)]
+        if error is not None:
+            lines.append('%s.errors.%s:1|c' % (name, error_code(error)))
+        self._send(lines)
+
+    def pages(self, command, count):
+        self._send(['%s.%s.pages:%d|h' % (self.prefix, command, count)])
+
+    def close(self):
+        """
+        Close the UDP socket.
+        """
+        self._socket.close()
@@ -25,6 +25,7 @@ with playlist objects.
 
 import pybrightcove
 from pybrightcove.enums import DEFAULT_SORT_BY, DEFAULT_SORT_ORDER
+from pybrightcove import fields
 
 VALID_PLAYLIST_TYPES = (pybrightcove.enums.PlaylistTypeEnum.EXPLICIT,
                         pybrightcove.enums.PlaylistTypeEnum.OLDEST_TO_NEWEST,
@@ -38,6 +39,21 @@ class Playlist(object):
     """
     The Playlist object is a collection of Videos.
     """
+
+    __slots__ = ('id', 'reference_id', 'account_id', 'name',
+        'short_description', 'thumbnail_url', 'videos', 'video_ids', 'type',
+        'raw_data', 'connection')
+
+    _fields = {
+        'name': fields.max_length(60,
+            "Playlist.name must be 60 characters or less."),
+        'reference_id': fields.max_length(150,
+            "Playlist.reference_id must be 150 characters or less."),
+        'short_description': fields.max_length(250,
+            "Playlist.short_description must be 250 chars or less."),
+        'type': fields.one_of(VALID_PLAYLIST_TYPES,
+            "Playlist.type must be a valid PlaylistTypeEnum")}
+
     # pylint: disable=C0103,R0913,R0902
     # redefine type,id builtins - refactor later
     # pylint: disable=W0622
@@ -57,7 +73,7 @@ class Playlist(object):
 
         self.connection = connection
         if not self.connection:
-            self.connection = pybrightcove.connection.APIConnection()
+            self.connection = pybrightcove.connection.get_default_connection()
 
         if name and type in VALID_PLAYLIST_TYPES:
             self.name = name
@@ -72,24 +88,6 @@ class Playlist(object):
             msg = "Invalid parameters for Playlist."
             raise pybrightcove.exceptions.PyBrightcoveError(msg)
 
-    def __setattr__(self, name, value):
-        msg = None
-        if value:
-            if name == 'name' and len(value) > 60:
-                # val = value[:60] ## Is this better?
-                msg = "Playlist.name must be 60 characters or less."
-            if name == 'reference_id' and len(value) > 150:
-                # val = value[:150]
-                msg = "Playlist.reference_id must be 150 characters or less."
-            if name == 'short_description' and len(value) > 250:
-                # val = value[:250]
-                msg = "Playlist.short_description must be 250 chars or less."
-            if name == 'type' and value not in VALID_PLAYLIST_TYPES:
-                msg = "Playlist.type must be a valid PlaylistTypeEnum"
-            if msg:
-                raise pybrightcove.exceptions.PyBrightcoveError(msg)
-        return super(Playlist, self).__setattr__(name, value)
-
     def _find_playlist(self):
         """
         Internal method to populate the object given the ``id`` or
@@ -131,15 +129,16 @@ class Playlist(object):
         Internal method that deserializes a ``pybrightcove.playlist.Playlist``
         object.
         """
-        self.raw_data = data
-        self.id = data['id']
-        self.reference_id = data['referenceId']
-        self.name = data['name']
-        self.short_description = data['shortDescription']
-        self.thumbnail_url = data['thumbnailURL']
-        self.videos = []
-        self.video_ids = data['videoIds']
-        self.type = data['playlistType']
+        set_raw = self._raw_setters
+        set_raw['raw_data'](self, data)
+        set_raw['id'](self, data['id'])
+        set_raw['reference_id'](self, data['referenceId'])
+        set_raw['name'](self, data['name'])
+        set_raw['short_description'](self, data['shortDescription'])
+        set_raw['thumbnail_url'](self, data['thumbnailURL'])
+        set_raw['videos'](self, [])
+        set_raw['video_ids'](self, data['videoIds'])
+        set_raw['type'](self, fields.intern_value(data['playlistType']))
 
         for video in data.get('videos', []):
             self.videos.append(pybrightcove.video.Video(
@@ -178,25 +177,29 @@ class Playlist(object):
 
     @staticmethod
     def find_by_ids(ids, connection=None, page_size=100, page_number=0,
-        sort_by=DEFAULT_SORT_BY, sort_order=DEFAULT_SORT_ORDER):
+        sort_by=DEFAULT_SORT_BY, sort_order=DEFAULT_SORT_ORDER, chunk_size=50,
+        workers=4):
         """
-        List playlists by specific IDs.
+        List playlists by specific IDs.  Long lists are split into chunks of
+        ``chunk_size`` ids that are fetched concurrently.
         """
-        ids = ','.join([str(i) for i in ids])
-        return pybrightcove.connection.ItemResultSet('find_playlists_by_ids',
-            Playlist, connection, page_size, page_number, sort_by, sort_order,
-            playlist_ids=ids)
+        return pybrightcove.connection.BatchItemResultSet(
+            'find_playlists_by_ids', Playlist, 'playlist_ids', ids, 'id',
+            connection, page_size, page_number, sort_by, sort_order,
+            chunk_size=chunk_size, workers=workers)
 
     @staticmethod
     def find_by_reference_ids(reference_ids, connection=None, page_size=100,
-        page_number=0, sort_by=DEFAULT_SORT_BY, sort_order=DEFAULT_SORT_ORDER):
+        page_number=0, sort_by=DEFAULT_SORT_BY, sort_order=DEFAULT_SORT_ORDER,
+        chunk_size=50, workers=4):
         """
-        List playlists by specific reference_ids.
+        List playlists by specific reference_ids.  Long lists are split into
+        chunks of ``chunk_size`` ids that are fetched concurrently.
         """
-        reference_ids = ','.join([str(i) for i in reference_ids])
-        return pybrightcove.connection.ItemResultSet(
-            "find_playlists_by_reference_ids", Playlist, connection, page_size,
-            page_number, sort_by, sort_order, reference_ids=reference_ids)
+        return pybrightcove.connection.BatchItemResultSet(
+            "find_playlists_by_reference_ids", Playlist, 'reference_ids',
+            reference_ids, 'reference_id', connection, page_size, page_number,
+            sort_by, sort_order, chunk_size=chunk_size, workers=workers)
 
     @staticmethod
     def find_for_player_id(player_id, connection=None, page_size=100,
@@ -207,3 +210,5 @@ class Playlist(object):
         return pybrightcove.connection.ItemResultSet(
             "find_playlists_for_player_id", Playlist, connection, page_size,
             page_number, sort_by, sort_order, player_id=player_id)
+
+fields.compile_fields(Playlist)
@@ -0,0 +1,151 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Client side rate limiting of Media API calls.  Pass a ``RateLimiter`` to
+``pybrightcove.connection.APIConnection`` to pace its calls::
+
+    limiter = RateLimiter(read_rate=10, write_rate=2)
+    conn = APIConnection(rate_limiter=limiter)
+
+One limiter can be shared by any number of connections and threads.  To
+share the budgets between processes as well, give the limiter the path of
+a state file all of them can write to (POSIX only)::
+
+    limiter = RateLimiter(read_rate=10, write_rate=2,
+        path='/var/run/myapp/brightcove-rate')
+"""
+
+import os
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from pybrightcove import exceptions
+
+
+class TokenBucket(object):
+    """
+    A token bucket refilled with ``rate`` tokens per second and holding at
+    most ``burst`` tokens.
+
+    ``acquire`` reserves a token and sleeps until the token is due, so
+    concurrent callers are spaced ``1 / rate`` seconds apart instead of being
+    let through in bursts.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens, last, now):
+        """
+        Take a token from a bucket holding ``tokens`` tokens at ``last`` and
+        return the new state and the number of seconds to wait.
+        """
+        tokens = min(self.burst, tokens + max(now - last, 0) * self.rate) - 1
+        wait = 0
+        if tokens < 0:
+            wait = -tokens / self.rate
+        return tokens, now, wait
+
+    def acquire(self):
+        """
+        Wait until a call may be made.
+        """
+        self._lock.acquire()
+        try:
+            self._tokens, self._last, wait = self._reserve(self._tokens,
+                self._last, time.time())
+        finally:
+            self._lock.release()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    A ``TokenBucket`` whose state is kept in the file at ``path`` so that it
+    is shared by every process using the same path.  The file is locked with
+    ``fcntl.flock`` while the state is updated.
+    """
+
+    def __init__(self, path, rate, burst=1):
+        if fcntl is None:
+            raise exceptions.ImproperlyConfiguredError(
+                "Sharing a rate limit between processes requires fcntl.")
+        super(FileTokenBucket, self).__init__(rate, burst)
+        self.path = path
+
+    def acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            state = os.read(fd, 64).split()
+            now = time.time()
+            try:
+                tokens, last = float(state[0]), float(state[1])
+            except (IndexError, ValueError):
+                tokens, last = float(self.burst), now
+            tokens, last, wait = self._reserve(tokens, last, now)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, '%r %r' % (tokens, last))
+        finally:
+            os.close(fd)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RateLimiter(object):
+    """
+    Separate token buckets for the calls made with the read token and with
+    the write token.  A rate of None leaves those calls unlimited.  With
+    ``path`` set the buckets are ``FileTokenBucket`` objects kept in
+    ``path + '.read'`` and ``path + '.write'``.
+    """
+
+    def __init__(self, read_rate=None, write_rate=None, burst=1, path=None):
+        self.read = self._bucket(read_rate, burst, path, 'read')
+        self.write = self._bucket(write_rate, burst, path, 'write')
+
+    @staticmethod
+    def _bucket(rate, burst, path, name):
+        if rate is None:
+            return None
+        if path:
+            return FileTokenBucket('%s.%s' % (path, name), rate, burst)
+        return TokenBucket(rate, burst)
+
+    def acquire(self, write=False):
+        """
+        Wait until a read call, or a write call if ``write`` is set, may be
+        made.
+        """
+        bucket = self.write if write else self.read
+        if bucket is not None:
+            bucket.acquire()
@@ -0,0 +1,140 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Retries of failed Media API calls.  Pass a ``RetryPolicy`` to
+``pybrightcove.connection.APIConnection`` to retry read calls that fail with
+a transient error::
+
+    conn = APIConnection(retry=RetryPolicy(max_attempts=5))
+
+Write calls are only retried when the policy is created with
+``retry_writes=True``, as a write that timed out may still have been applied.
+"""
+
+import time
+import random
+import socket
+import ftplib
+import httplib
+import urllib2
+import threading
+
+from pybrightcove import exceptions
+
+
+RETRYABLE_ERRORS = (exceptions.UnknownServerError,
+                    exceptions.ServiceDeployingError,
+                    exceptions.CallTimeoutError,
+                    exceptions.IncompleteUploadError,
+                    socket.error,
+                    EOFError,
+                    ftplib.error_temp,
+                    httplib.HTTPException)
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+def is_retryable(error):
+    """
+    Whether ``error`` is transient: codes 100, 101 and 103 of the Media API,
+    socket and HTTP protocol errors, the HTTP statuses in
+    ``RETRYABLE_STATUS``, temporary FTP replies, dropped FTP control
+    connections and incomplete FTP uploads.  Every other error, such as
+    ``InvalidTokenError``, is fatal.
+    """
+    if isinstance(error, urllib2.HTTPError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class RetryPolicy(object):
+    """
+    Retry transient errors up to ``max_attempts`` attempts per call, sleeping
+    for a random delay between 0 and ``base_delay * 2 ** retry`` seconds
+    (capped at ``max_delay``) before each retry.
+
+    Retries are paid for by a budget shared by every call made with the
+    policy: each call adds ``budget_ratio`` of a retry to the budget, up to
+    ``budget_max`` retries, and each retry takes one.  When the budget is
+    spent errors are raised without retrying, so a failing service is not
+    hammered with retries.  ``retries`` counts the retries made.  The policy
+    is safe to share between threads and connections.
+    """
+    # pylint: disable=R0902
+
+    def __init__(self, max_attempts=4, base_delay=0.25, max_delay=10.0,
+        budget_ratio=0.2, budget_max=10, retry_writes=False):
+        # pylint: disable=R0913
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_max = budget_max
+        self.retry_writes = retry_writes
+        self.retries = 0
+        self._budget = float(budget_max)
+        self._lock = threading.Lock()
+
+    def delay(self, retry):
+        """
+        The number of seconds to sleep before retry number ``retry``.
+        """
+        return random.uniform(0,
+            min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def _deposit(self):
+        self._lock.acquire()
+        try:
+            self._budget = min(self.budget_max,
+                self._budget + self.budget_ratio)
+        finally:
+            self._lock.release()
+
+    def _withdraw(self):
+        self._lock.acquire()
+        try:
+            if self._budget < 1:
+                return False
+            self._budget -= 1
+            self.retries += 1
+            return True
+        finally:
+            self._lock.release()
+
+    def call(self, func, write=False, no_retry=()):
+        """
+        Call ``func`` until it returns, retrying the transient errors it
+        raises.  Calls with ``write`` set are only retried if the policy
+        allows write retries, and errors that are instances of the classes in
+        ``no_retry`` are never retried.
+        """
+        self._deposit()
+        retry = 0
+        while True:
+            try:
+                return func()
+            except Exception, error:
+                retry += 1
+                if (write and not self.retry_writes) or \
+                    isinstance(error, no_retry) or \
+                    retry >= self.max_attempts or \
+                    not is_retryable(error) or not self._withdraw():
+                    raise
+            time.sleep(self.delay(retry))
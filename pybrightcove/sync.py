@@ -0,0 +1,206 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Keep a local copy of a Brightcove video catalog up to date.
+
+The first ``CatalogMirror.sync`` loads the whole catalog with
+``Video.find_all``; later runs only ask ``Video.find_modified`` for what
+changed since the previous run, so their cost is proportional to the number
+of changes rather than to the size of the catalog::
+
+    mirror = CatalogMirror(SQLiteStore('/var/lib/catalog.db'))
+    mirror.sync()
+    video = mirror.store.get(123456)
+"""
+
+import time
+import sqlite3
+import threading
+import simplejson
+
+from datetime import datetime
+
+from pybrightcove import enums
+from pybrightcove import video
+
+
+MODIFIED_FILTERS = [enums.FilterChoicesEnum.PLAYABLE,
+                    enums.FilterChoicesEnum.INACTIVE,
+                    enums.FilterChoicesEnum.DELETED,
+                    enums.FilterChoicesEnum.UNSCHEDULED]
+
+
+class MirrorStore(object):
+    """
+    Abstract base class for the storage behind a ``CatalogMirror``.  Videos
+    are stored as the raw dictionaries returned by the Media API.
+    """
+
+    def get_high_water_mark(self):
+        """
+        Return the unix timestamp up to which the store is known to be in
+        sync, or None if it has never been loaded.
+        """
+        # pylint: disable=W,C,R
+        raise Exception("Base class must implement this method.")
+
+    def set_high_water_mark(self, timestamp):
+        # pylint: disable=W,C,R
+        raise Exception("Base class must implement this method.")
+
+    def upsert(self, video_id, data):
+        # pylint: disable=W,C,R
+        raise Exception("Base class must implement this method.")
+
+    def delete(self, video_id):
+        # pylint: disable=W,C,R
+        raise Exception("Base class must implement this method.")
+
+    def get_data(self, video_id):
+        """
+        Return the raw data stored for ``video_id``, or None.
+        """
+        # pylint: disable=W,C,R
+        raise Exception("Base class must implement this method.")
+
+    def commit(self):
+        """
+        Make the changes since the last commit durable.
+        """
+        pass
+
+    def get(self, video_id, _connection=None):
+        """
+        Return the stored ``pybrightcove.video.Video`` for ``video_id``, or
+        None.
+        """
+        data = self.get_data(video_id)
+        if data is not None:
+            return video.Video(data=data, _connection=_connection)
+
+
+class SQLiteStore(MirrorStore):
+    """
+    A ``MirrorStore`` kept in a SQLite database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS videos ("
+            "id INTEGER PRIMARY KEY, reference_id TEXT, "
+            "last_modified INTEGER, data TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS state ("
+            "name TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+    def _execute(self, sql, params=()):
+        self._lock.acquire()
+        try:
+            return self._db.execute(sql, params).fetchall()
+        finally:
+            self._lock.release()
+
+    def get_high_water_mark(self):
+        rows = self._execute(
+            "SELECT value FROM state WHERE name = 'high_water_mark'")
+        if rows:
+            return float(rows[0][0])
+
+    def set_high_water_mark(self, timestamp):
+        self._execute("INSERT OR REPLACE INTO state (name, value) "
+            "VALUES ('high_water_mark', ?)", (repr(timestamp), ))
+
+    def upsert(self, video_id, data):
+        self._execute("INSERT OR REPLACE INTO videos "
+            "(id, reference_id, last_modified, data) VALUES (?, ?, ?, ?)",
+            (video_id, data.get('referenceId'), data.get('lastModifiedDate'),
+             simplejson.dumps(data)))
+
+    def delete(self, video_id):
+        self._execute("DELETE FROM videos WHERE id = ?", (video_id, ))
+
+    def get_data(self, video_id):
+        rows = self._execute("SELECT data FROM videos WHERE id = ?",
+            (video_id, ))
+        if rows:
+            return simplejson.loads(rows[0][0])
+
+    def commit(self):
+        self._lock.acquire()
+        try:
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        return self._execute("SELECT COUNT(*) FROM videos")[0][0]
+
+
+class CatalogMirror(object):
+    """
+    Synchronizes a ``MirrorStore`` with the catalog of an account.
+
+    ``overlap`` is the number of seconds that each incremental run reaches
+    back before the previous high water mark, to cover clock skew between this
+    host and the API and changes made while the previous run was in flight.
+    Applying a change twice is harmless.
+    """
+
+    def __init__(self, store, _connection=None, page_size=100, overlap=300):
+        self.store = store
+        self.connection = _connection
+        self.page_size = page_size
+        self.overlap = overlap
+
+    def sync(self):
+        """
+        Bring the store up to date and return the number of videos that were
+        written or deleted.
+        """
+        started = time.time()
+        mark = self.store.get_high_water_mark()
+        if mark is None:
+            items = video.Video.find_all(_connection=self.connection,
+                page_size=self.page_size)
+        else:
+            since = datetime.fromtimestamp(mark - self.overlap)
+            items = video.Video.find_modified(since,
+                filter_list=MODIFIED_FILTERS, _connection=self.connection,
+                page_size=self.page_size)
+        changes = 0
+        for item in items:
+            data = item.raw_data
+            if data.get('itemState') == enums.ItemStateEnum.DELETED:
+                self.store.delete(item.id)
+            else:
+                self.store.upsert(item.id, data)
+            changes += 1
+        self.store.set_high_water_mark(started)
+        self.store.commit()
+        return changes
+
+    def get(self, video_id):
+        """
+        Return the mirrored ``pybrightcove.video.Video`` for ``video_id``, or
+        None.
+        """
+        return self.store.get(video_id, _connection=self.connection)
@@ -0,0 +1,113 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Upload many videos concurrently::
+
+    def progress(video, state, value):
+        print video.name, state, value
+
+    manager = UploadManager(workers=4, progress=progress)
+    results = [manager.submit(Video(filename=path, name=name,
+        short_description=name)) for path, name in files]
+    manager.close()
+    ids = [result.get() for result in results]
+"""
+
+import threading
+
+from multiprocessing.pool import ThreadPool
+
+from pybrightcove import checksum
+
+
+QUEUED = 'queued'
+UPLOADING = 'uploading'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class UploadManager(object):
+    """
+    Saves ``pybrightcove.video.Video`` objects on a pool of ``workers``
+    threads.
+
+    ``submit`` starts hashing the file of the video at once, on the threads
+    of the default ``pybrightcove.checksum.HashEngine``, so that the files
+    waiting for an upload slot are hashed while earlier ones are being
+    transferred.  The uploads share the keep-alive connection pool of the
+    connection of each video.
+
+    ``submit`` returns a ``multiprocessing.pool.AsyncResult`` whose ``get()``
+    returns the id of the saved video or raises the error of the upload.
+    ``progress``, if given, is called from the upload threads as
+    ``progress(video, state, value)`` when a video is ``QUEUED``, starts
+    ``UPLOADING``, is ``DONE`` (value is its id) or has ``FAILED`` (value is
+    the error).  ``done`` and ``failed`` count finished uploads.
+    """
+
+    def __init__(self, workers=4, progress=None):
+        self.workers = workers
+        self.progress = progress
+        self.done = 0
+        self.failed = 0
+        self._pool = ThreadPool(workers)
+        self._lock = threading.Lock()
+
+    def _notify(self, video, state, value=None):
+        if self.progress is not None:
+            self.progress(video, state, value)
+
+    def _count(self, name):
+        self._lock.acquire()
+        try:
+            setattr(self, name, getattr(self, name) + 1)
+        finally:
+            self._lock.release()
+
+    def _save(self, video, kwargs):
+        self._notify(video, UPLOADING)
+        try:
+            video.save(**kwargs)
+        except Exception, error:
+            self._count('failed')
+            self._notify(video, FAILED, error)
+            raise
+        self._count('done')
+        self._notify(video, DONE, video.id)
+        return video.id
+
+    def submit(self, video, callback=None, **kwargs):
+        """
+        Queue ``video.save(**kwargs)`` and return its ``AsyncResult``.
+        ``callback`` is called with the video id once it is saved.
+        """
+        if isinstance(video._filename, basestring):
+            checksum.md5_async(video._filename)
+        self._notify(video, QUEUED)
+        return self._pool.apply_async(self._save, (video, kwargs),
+            callback=callback)
+
+    def close(self):
+        """
+        Wait for the queued uploads to finish and stop the threads.
+        """
+        self._pool.close()
+        self._pool.join()
@@ -24,15 +24,16 @@
 The ``pybrightcove.video`` module supports all the Brightcove Video APIs.
 """
 
-import hashlib
 import os
 import time
 
 from datetime import datetime
 
+from pybrightcove import checksum
 from pybrightcove import connection
 from pybrightcove import enums
 from pybrightcove import exceptions
+from pybrightcove import fields
 
 
 def is_ftp_connection(con):
@@ -58,6 +59,58 @@ def _make_tstamp(val):
         return int(time.mktime(val.timetuple()) * 1000)
 
 
+def _load_tags(data):
+    """
+    Copy the list of tags out of raw video data.
+    """
+    return [fields.intern_value(tag) for tag in data['tags']]
+
+
+# Attributes set by ``Video._load`` and how to compute them from the raw data,
+# in the order they are loaded.
+VIDEO_LOADERS = (
+    ('creation_date', lambda data: _convert_tstamp(data['creationDate'])),
+    ('economics', lambda data: fields.intern_value(data['economics'])),
+    ('id', lambda data: data['id']),
+    ('last_modified_date',
+        lambda data: _convert_tstamp(data['lastModifiedDate'])),
+    ('length', lambda data: data['length']),
+    ('link_text', lambda data: data['linkText']),
+    ('link_url', lambda data: data['linkURL']),
+    ('long_description', lambda data: data['longDescription']),
+    ('name', lambda data: data['name']),
+    ('plays_total', lambda data: data['playsTotal']),
+    ('plays_trailing_week', lambda data: data['playsTrailingWeek']),
+    ('published_date', lambda data: _convert_tstamp(data['publishedDate'])),
+    ('start_date', lambda data: _convert_tstamp(data.get('startDate', None))),
+    ('end_date', lambda data: _convert_tstamp(data.get('endDate', None))),
+    ('reference_id', lambda data: data['referenceId']),
+    ('short_description', lambda data: data['shortDescription']),
+    ('tags', _load_tags),
+    ('thumbnail_url', lambda data: data['thumbnailURL']),
+    ('video_still_url', lambda data: data['videoStillURL']))
+
+# Attributes that ``Video.__init__`` sets and ``Video._load`` leaves alone.
+VIDEO_DEFAULTS = (
+    ('_filename', lambda: None),
+    ('accountId', lambda: None),
+    ('flv_url', lambda: None),
+    ('renditions', list),
+    ('assets', list),
+    ('metadata', list),
+    ('video_full_length', lambda: None),
+    ('item_state', lambda: None),
+    ('geo_filtered', lambda: None),
+    ('geo_filtered_countries', lambda: None),
+    ('geo_filtered_exclude', lambda: None),
+    ('cue_points', lambda: None),
+    ('image', lambda: None))
+
+_LAZY_FIELDS = dict(
+    [(name, (loader, True)) for name, loader in VIDEO_LOADERS] +
+    [(name, (factory, False)) for name, factory in VIDEO_DEFAULTS])
+
+
 class Image(object):
     """
     This object represents metadata about an image file in your account. Images
@@ -71,6 +124,8 @@ class Image(object):
     [1] http://help.brightcove.com/developer/docs/mediaapi/add_image.cfm
     """
 
+    __slots__ = ('id', 'reference_id', 'type', 'remote_url', 'display_name')
+
     def __init__(self, data=None, **kwargs):
         self.id = kwargs.get('id', None)
         self.reference_id = kwargs.get('reference_id', None)
@@ -81,7 +136,7 @@ class Image(object):
         if data:
             self.id = data['id']
             self.reference_id = data['referenceId']
-            self.type = data['type']
+            self.type = fields.intern_value(data['type'])
             self.remote_url = data["remoteUrl"]
             self.display_name = data["displayName"]
 
@@ -114,6 +169,21 @@ class Rendition(object):
     [3] http://help.brightcove.com/developer/docs/mediaapi/create-mbr.cfm
     """
 
+    __slots__ = ('url', 'encoding_rate', 'frame_height', 'frame_width', 'size',
+        'remote_url', 'remote_stream_name', 'video_duration', 'video_codec')
+
+    _fields = {
+        'video_duration': fields.instance_of((int, long),
+            "Rendition.video_duration must be the duration in milliseconds "
+            "as an integer or long."),
+        'size': fields.instance_of((int, long),
+            "Rendition.size must be the number of bytes as an integer or "
+            "long."),
+        'video_codec': fields.one_of(
+            (enums.VideoCodecEnum.SORENSON, enums.VideoCodecEnum.ON2,
+             enums.VideoCodecEnum.H264),
+            "Rendition.video_codec must be SORENSON, ON2, or H264.")}
+
     def __init__(self, data=None):
         self.url = None
         self.encoding_rate = None
@@ -134,26 +204,7 @@ class Rendition(object):
             self.remote_url = data['remoteUrl']
             self.remote_stream_name = data.get('remoteStreamName', None)
             self.video_duration = data['videoDuration']
-            self.video_codec = data['videoCodec']
-
-    def __setattr__(self, name, value):
-        msg = None
-        if value:
-            if name == 'video_duration' and not isinstance(value, (int, long)):
-                msg = "Rendition.video_duration must be the duration in "
-                msg += "milliseconds as an integer or long."
-            if name == 'size' and not isinstance(value, (int, long)):
-                msg = "Rendition.size must be the number of bytes as an "
-                msg += "integer or long."
-            if name == 'video_codec' and \
-                    value not in (enums.VideoCodecEnum.SORENSON,
-                                  enums.VideoCodecEnum.ON2,
-                                  enums.VideoCodecEnum.H264):
-                msg = "Rendition.video_codec must be SORENSON, ON2, or H264."
-
-            if msg:
-                raise exceptions.PyBrightcoveError(msg)
-        return super(Rendition, self).__setattr__(name, value)
+            self.video_codec = fields.intern_value(data['videoCodec'])
 
     def to_dict(self):
         """
@@ -172,6 +223,8 @@ class Rendition(object):
         [data.pop(key) for key in data.keys() if data[key] is None]
         return data
 
+fields.compile_fields(Rendition)
+
 
 class CuePoint(object):
     """
@@ -184,6 +237,8 @@ class CuePoint(object):
     [1] http://help.brightcove.com/developer/docs/mediaapi/cue-points.cfm
     """
 
+    __slots__ = ('name', 'video_id', 'time', 'force_stop', 'type', 'metadata')
+
     def __init__(self, data=None):
         self.name = None
         self.video_id = None
@@ -197,7 +252,7 @@ class CuePoint(object):
             self.video_id = data['video_id']
             self.time = data['time']
             self.force_stop = data['forceStop']
-            self.type = data['type']
+            self.type = fields.intern_value(data['type'])
             self.metadata = data['metadata']
 
     def to_dict(self):
@@ -221,8 +276,42 @@ class Video(object):
     """
     The Video object is an aggregation of metadata and asset information
     associated with a video.
+
+    ``filename`` is the path of the file to upload, or a file-like object or
+    iterable of strings, such as a pipe from a transcoder, which is streamed
+    to the API as it is read.
     """
 
+    __slots__ = ('_filename', 'name', 'short_description', 'id',
+        'reference_id', 'accountId', 'long_description', 'flv_url',
+        'renditions', 'assets', 'metadata', 'video_full_length',
+        'creation_date', 'published_date', 'last_modified_date', 'item_state',
+        'start_date', 'end_date', 'link_url', 'link_text', 'tags',
+        'video_still_url', 'thumbnail_url', 'length', 'economics',
+        'geo_filtered', 'geo_filtered_countries', 'geo_filtered_exclude',
+        'cue_points', 'plays_total', 'plays_trailing_week', 'image',
+        'raw_data', 'connection', '_lazy')
+
+    _fields = {
+        'name': fields.max_length(255,
+            "Video.name must be 255 characters or less."),
+        'reference_id': fields.max_length(150,
+            "Video.reference_id must be 150 characters or less."),
+        'long_description': fields.max_length(5000,
+            "Video.long_description must be 5000 characters or less."),
+        'short_description': fields.max_length(250,
+            "Video.short_description must be 250 characters or less."),
+        'item_state': fields.one_of(
+            (enums.ItemStateEnum.ACTIVE, enums.ItemStateEnum.INACTIVE),
+            "Video.item_state must be either ItemStateEnum.ACTIVE or "
+            "ItemStateEnum.INACTIVE"),
+        'video_full_length': fields.instance_of(Rendition,
+            "Video.video_full_length must be of type Rendition"),
+        'economics': fields.one_of(
+            (enums.EconomicsEnum.FREE, enums.EconomicsEnum.AD_SUPPORTED),
+            "Video.economics must be either EconomicsEnum.FREE or "
+            "EconomicsEnum.AD_SUPPORTED")}
+
     # pylint: disable=W0622
     def __init__(self, filename=None, name=None, short_description=None,
         id=None, reference_id=None, renditions=None, data=None,
@@ -265,7 +354,7 @@ class Video(object):
 
         self.connection = _connection
         if not self.connection:
-            self.connection = connection.APIConnection()
+            self.connection = connection.get_default_connection()
 
         if is_ftp_connection(self.connection):
             if reference_id and name and short_description:
@@ -342,11 +431,27 @@ class Video(object):
         [data.pop(key) for key in data.keys() if data[key] == None]
         return data
 
+    def _wait_for_checksums(self):
+        """
+        Fill in the ``hash-code`` and ``refid`` of the assets whose checksums
+        are being computed.
+        """
+        for asset in self.assets:
+            result = asset.get('_checksum')
+            if result is not None:
+                # A failed checksum is kept, so its error is raised again by
+                # every later call rather than leaving the asset unhashed.
+                asset['hash-code'] = result.get()
+                asset['refid'] = "%s-%s" % (
+                    os.path.basename(asset['filename']), asset['hash-code'])
+                del asset['_checksum']
+
     def to_xml(self):
         # pylint: disable=R0912
         """
         Converts object into an XML string.
         """
+        self._wait_for_checksums()
         xml = ''
         for asset in self.assets:
             xml += '<asset filename="%s" ' % \
@@ -415,60 +520,44 @@ class Video(object):
         object.
         """
         self.raw_data = data
-        self.creation_date = _convert_tstamp(data['creationDate'])
-        self.economics = data['economics']
-        self.id = data['id']
-        self.last_modified_date = _convert_tstamp(data['lastModifiedDate'])
-        self.length = data['length']
-        self.link_text = data['linkText']
-        self.link_url = data['linkURL']
-        self.long_description = data['longDescription']
-        self.name = data['name']
-        self.plays_total = data['playsTotal']
-        self.plays_trailing_week = data['playsTrailingWeek']
-        self.published_date = _convert_tstamp(data['publishedDate'])
-        self.start_date = _convert_tstamp(data.get('startDate', None))
-        self.end_date = _convert_tstamp(data.get('endDate', None))
-        self.reference_id = data['referenceId']
-        self.short_description = data['shortDescription']
-        self.tags = []
-        for tag in data['tags']:
-            self.tags.append(tag)
-        self.thumbnail_url = data['thumbnailURL']
-        self.video_still_url = data['videoStillURL']
-
-    def __setattr__(self, name, value):
-        msg = None
-        if value:
-            if name == 'name' and len(value) > 255:
-                msg = "Video.name must be 255 characters or less."
-            if name == 'reference_id' and len(value) > 150:
-                # val = value[:150]
-                msg = "Video.reference_id must be 150 characters or less."
-            if name == 'long_description' and len(value) > 5000:
-                # val = value[:5000]
-                msg = "Video.long_description must be 5000 characters or less."
-            if name == 'short_description' and len(value) > 250:
-                # val = value[:250]
-                msg = "Video.short_description must be 250 characters or less."
-            if name == 'item_state' and value not in (
-                    enums.ItemStateEnum.ACTIVE,
-                    enums.ItemStateEnum.INACTIVE):
-                msg = "Video.item_state must be either ItemStateEnum.ACTIVE or"
-                msg += " ItemStateEnum.INACTIVE"
-            if name == 'video_full_length' and \
-                    not isinstance(value, Rendition):
-                msg = "Video.video_full_length must be of type Rendition"
-            if name == 'economics' and value not in \
-                    (enums.EconomicsEnum.FREE,
-                     enums.EconomicsEnum.AD_SUPPORTED):
-                msg = "Video.economics must be either EconomicsEnum.FREE or "
-                msg += "EconomicsEnum.AD_SUPPORTED"
-
-            if msg:
-                raise exceptions.PyBrightcoveError(msg)
-        return super(Video, self).__setattr__(name, value)
-    
+        raw_setters = self._raw_setters
+        for name, loader in VIDEO_LOADERS:
+            raw_setters[name](self, loader(data))
+
+    @classmethod
+    def lazy_load(cls, data, _connection=None):
+        """
+        Build a ``Video`` from API data without decoding it.  Each attribute
+        is computed from ``raw_data`` the first time it is read, after which
+        the object is indistinguishable from one built with
+        ``Video(data=data)``.
+        """
+        video = cls.__new__(cls)
+        object.__setattr__(video, '_lazy', True)
+        video.raw_data = data
+        video.connection = _connection
+        if not video.connection:
+            video.connection = connection.get_default_connection()
+        return video
+
+    def __getattr__(self, name):
+        # Only called for attributes that have not been set yet.
+        if name not in _LAZY_FIELDS:
+            raise AttributeError(name)
+        try:
+            lazy = self._lazy
+        except AttributeError:
+            lazy = False
+        if not lazy:
+            raise AttributeError(name)
+        func, from_data = _LAZY_FIELDS[name]
+        if from_data:
+            value = func(self.raw_data)
+        else:
+            value = func()
+        self._raw_setters[name](self, value)
+        return value
+
     def get_custom_metadata(self):
         """
         Fetches custom metadta for an already exisiting Video.
@@ -496,24 +585,17 @@ class Video(object):
         h264_preserve_as_rendition=False, h264_no_processing=False):
         """
         Add an asset to the Video object.
-        """
-        m = hashlib.md5()
-        fp = file(filename, 'rb')
-        bits = fp.read(262144)  ## 256KB
-        while bits:
-            m.update(bits)
-            bits = fp.read(262144)
-        fp.close()
-
-        hash_code = m.hexdigest()
-        refid = "%s-%s" % (os.path.basename(filename), hash_code)
 
+        The checksum of the file is computed in the background; ``to_xml``
+        and ``save`` wait for it.
+        """
         asset = {
             'filename': filename,
             'type': asset_type,
             'size': os.path.getsize(filename),
-            'refid': refid,
-            'hash-code': hash_code}
+            'refid': None,
+            'hash-code': None,
+            '_checksum': checksum.md5_async(filename)}
 
         if encoding_rate:
             asset.update({'encoding-rate': encoding_rate})
@@ -615,7 +697,7 @@ class Video(object):
         """
         c = _connection
         if not c:
-            c = connection.APIConnection()
+            c = connection.get_default_connection()
         c.post('delete_video', video_id=video_id, cascade=cascade,
             delete_shares=delete_shares)
 
@@ -626,7 +708,7 @@ class Video(object):
         """
         c = _connection
         if not c:
-            c = connection.APIConnection()
+            c = connection.get_default_connection()
         return c.post('get_upload_status', video_id=video_id)
 
     @staticmethod
@@ -636,7 +718,7 @@ class Video(object):
         """
         c = _connection
         if not c:
-            c = connection.APIConnection()
+            c = connection.get_default_connection()
         data = c.post('update_video', video={
             'id': video_id,
             'itemState': enums.ItemStateEnum.ACTIVE})
@@ -645,9 +727,13 @@ class Video(object):
     @staticmethod
     def find_modified(since, filter_list=None, _connection=None, page_size=25,
         page_number=0, sort_by=enums.DEFAULT_SORT_BY,
-        sort_order=enums.DEFAULT_SORT_ORDER):
+        sort_order=enums.DEFAULT_SORT_ORDER, adaptive=True):
         """
         List all videos modified since a certain date.
+
+        The API is slow to answer this command, so by default the page size
+        starts at ``page_size`` and adapts to the time each page takes (see
+        ``pybrightcove.connection.adaptive_item_lister``).
         """
         filters = []
         if filter_list is not None:
@@ -658,7 +744,7 @@ class Video(object):
         fdate = int(since.strftime("%s")) / 60  ## Minutes since UNIX time
         return connection.ItemResultSet('find_modified_videos',
             Video, _connection, page_size, page_number, sort_by, sort_order,
-            from_date=fdate, filter=filters)
+            adaptive=adaptive, from_date=fdate, filter=filters)
 
     @staticmethod
     def find_all(_connection=None, page_size=100, page_number=0,
@@ -731,29 +817,36 @@ class Video(object):
     @staticmethod
     def find_by_reference_ids(reference_ids, _connection=None, page_size=100,
         page_number=0, sort_by=enums.DEFAULT_SORT_BY,
-        sort_order=enums.DEFAULT_SORT_ORDER):
+        sort_order=enums.DEFAULT_SORT_ORDER, chunk_size=50, workers=4):
         """
-        List all videos identified by a list of reference ids
+        List all videos identified by a list of reference ids.  Long lists
+        are split into chunks of ``chunk_size`` ids that are fetched
+        concurrently by ``workers`` threads.
         """
         if not isinstance(reference_ids, (list, tuple)):
             err = "Video.find_by_reference_ids expects an iterable argument"
             raise exceptions.PyBrightcoveError(err)
-        ids = ','.join(reference_ids)
-        return connection.ItemResultSet(
-            'find_videos_by_reference_ids', Video, _connection, page_size,
-            page_number, sort_by, sort_order, reference_ids=ids)
+        return connection.BatchItemResultSet(
+            'find_videos_by_reference_ids', Video, 'reference_ids',
+            reference_ids, 'reference_id', _connection, page_size,
+            page_number, sort_by, sort_order, chunk_size=chunk_size,
+            workers=workers)
 
     @staticmethod
     def find_by_ids(ids, _connection=None, page_size=100, page_number=0,
-        sort_by=enums.DEFAULT_SORT_BY, sort_order=enums.DEFAULT_SORT_ORDER):
+        sort_by=enums.DEFAULT_SORT_BY, sort_order=enums.DEFAULT_SORT_ORDER,
+        chunk_size=50, workers=4):
         """
-        List all videos identified by a list of Brightcove video ids
+        List all videos identified by a list of Brightcove video ids.  Long
+        lists are split into chunks of ``chunk_size`` ids that are fetched
+        concurrently by ``workers`` threads.
         """
         if not isinstance(ids, (list, tuple)):
             err = "Video.find_by_ids expects an iterable argument"
             raise exceptions.PyBrightcoveError(err)
-        ids = ','.join([str(i) for i in ids])
-        return connection.ItemResultSet('find_videos_by_ids',
-            Video, _connection, page_size, page_number, sort_by, sort_order,
-            video_ids=ids)
+        return connection.BatchItemResultSet('find_videos_by_ids',
+            Video, 'video_ids', ids, 'id', _connection, page_size,
+            page_number, sort_by, sort_order, chunk_size=chunk_size,
+            workers=workers)
 
+fields.compile_fields(Video)
@@ -0,0 +1,115 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+import mock
+import pybrightcove
+from pybrightcove.cache import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_key_is_normalized(self):
+        k1 = ResponseCache.key('find_videos_by_ids',
+            {'video_ids': [1, 2], 'page_size': 10, 'sort_by': None})
+        k2 = ResponseCache.key('find_videos_by_ids',
+            {'page_size': '10', 'video_ids': '1,2'})
+        self.assertEquals(k1, k2)
+
+    def test_hit_and_miss(self):
+        cache = ResponseCache()
+        key = cache.key('find_video_by_id', {'video_id': 1})
+        self.assertEquals(cache.get(key), None)
+        cache.set(key, '{"id": 1}')
+        self.assertEquals(cache.get(key), '{"id": 1}')
+        self.assertEquals((cache.hits, cache.misses), (1, 1))
+
+    @mock.patch('time.time')
+    def test_per_command_ttl(self, TimeMock):
+        TimeMock.return_value = 1000
+        cache = ResponseCache(default_ttl=10, ttls={'find_all_videos': 0,
+            'find_video_by_id': 100})
+        by_id = cache.key('find_video_by_id', {'video_id': 1})
+        by_ref = cache.key('find_video_by_reference_id', {'reference_id': 1})
+        all_videos = cache.key('find_all_videos', {})
+        for key in (by_id, by_ref, all_videos):
+            cache.set(key, '{}')
+        self.assertEquals(len(cache), 2)
+        TimeMock.return_value = 1050
+        self.assertEquals(cache.get(by_id), '{}')
+        self.assertEquals(cache.get(by_ref), None)
+
+    def test_lru_eviction_by_count(self):
+        cache = ResponseCache(max_entries=2)
+        a, b, c = [cache.key('find_video_by_id', {'video_id': i})
+            for i in (1, 2, 3)]
+        cache.set(a, 'a')
+        cache.set(b, 'b')
+        cache.get(a)
+        cache.set(c, 'c')
+        self.assertEquals(cache.get(b), None)
+        self.assertEquals(cache.get(a), 'a')
+        self.assertEquals(cache.get(c), 'c')
+
+    def test_lru_eviction_by_bytes(self):
+        cache = ResponseCache(max_bytes=10)
+        a, b = [cache.key('find_video_by_id', {'video_id': i}) for i in (1, 2)]
+        cache.set(a, 'x' * 6)
+        cache.set(b, 'y' * 6)
+        self.assertEquals(cache.get(a), None)
+        self.assertEquals(cache.get(b), 'y' * 6)
+        self.assertEquals(cache.size, 6)
+        cache.set(a, 'z' * 11)
+        self.assertEquals(cache.get(a), None)
+
+
+class APIConnectionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache()
+        self.api = pybrightcove.connection.APIConnection(read_token="read",
+            write_token="write", cache=self.cache)
+
+    @mock.patch('pybrightcove.connection.APIConnection._request')
+    def test_cached_read(self, RequestMock):
+        RequestMock.return_value.read.return_value = '{"id": 1}'
+        for i in range(3):
+            self.assertEquals(
+                self.api.get_item('find_video_by_id', video_id=1), {"id": 1})
+        self.assertEquals(RequestMock.call_count, 1)
+        self.api.get_item('find_video_by_id', video_id=2)
+        self.assertEquals(RequestMock.call_count, 2)
+        self.assertEquals((self.cache.hits, self.cache.misses), (2, 2))
+
+    @mock.patch('pybrightcove.connection.APIConnection._request')
+    def test_errors_are_not_cached(self, RequestMock):
+        RequestMock.return_value.read.return_value = \
+            '{"error": {"code": 100, "message": "oops"}}'
+        for i in range(2):
+            self.assertRaises(pybrightcove.exceptions.UnknownServerError,
+                self.api.get_item, 'find_video_by_id', video_id=1)
+        self.assertEquals(RequestMock.call_count, 2)
+
+    @mock.patch('pybrightcove.connection.APIConnection._request')
+    def test_write_clears_cache(self, RequestMock):
+        RequestMock.return_value.read.return_value = '{"result": 1, "id": 1}'
+        self.api.get_item('find_video_by_id', video_id=1)
+        self.api.post('update_video', video={'id': 1})
+        self.assertEquals(len(self.cache), 0)
@@ -0,0 +1,157 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+import mock
+from pybrightcove import checksum
+from pybrightcove.checksum import ChecksumCache, HashEngine
+
+
+class ChecksumCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'bears.mov')
+        self._write('bears' * 100000)
+
+    def tearDown(self):
+        checksum.set_default_cache(None)
+        shutil.rmtree(self.dir)
+
+    def _write(self, data, mtime=1300000000):
+        fp = open(self.filename, 'wb')
+        fp.write(data)
+        fp.close()
+        os.utime(self.filename, (mtime, mtime))
+
+    def test_file_is_read_once(self):
+        cache = ChecksumCache()
+        expected = hashlib.md5('bears' * 100000).hexdigest()
+        self.assertEquals(cache.md5(self.filename), expected)
+        with mock.patch('pybrightcove.checksum.compute_md5') as ComputeMock:
+            self.assertEquals(cache.md5(self.filename), expected)
+            self.assertFalse(ComputeMock.called)
+        self.assertEquals((cache.hits, cache.misses), (1, 1))
+
+    def test_changed_file_is_read_again(self):
+        cache = ChecksumCache()
+        cache.md5(self.filename)
+        self._write('lions', mtime=1300000100)
+        self.assertEquals(cache.md5(self.filename),
+            hashlib.md5('lions').hexdigest())
+        self.assertEquals(cache.misses, 2)
+
+    def test_persisted(self):
+        path = os.path.join(self.dir, 'checksums.db')
+        digest = ChecksumCache(path).md5(self.filename)
+        cache = ChecksumCache(path)
+        with mock.patch('pybrightcove.checksum.compute_md5') as ComputeMock:
+            self.assertEquals(cache.md5(self.filename), digest)
+            self.assertFalse(ComputeMock.called)
+
+    def test_default_cache_from_config(self):
+        path = os.path.join(self.dir, 'checksums.db')
+        with mock.patch.dict(os.environ,
+            {'PYBRIGHTCOVE_CACHE_CHECKSUM_CACHE': path}):
+            self.assertEquals(checksum.get_default_cache().path, path)
+
+    def test_add_asset_and_post_share_the_cache(self):
+        from pybrightcove import video, connection
+        cache = ChecksumCache()
+        checksum.set_default_cache(cache)
+        v = video.Video(name='Bears', short_description='Bears',
+            reference_id='bears',
+            _connection=connection.FTPConnection(host='host'))
+        v.add_asset(self.filename, 'VIDEO_FULL', 'Bears')
+        v.to_xml()
+        api = connection.APIConnection(read_token='read', write_token='write')
+        api._post = mock.Mock(return_value=1)
+        api.post('create_video', self.filename)
+        self.assertEquals(api._post.call_args[1]['data']['params']
+            ['file_checksum'], v.assets[0]['hash-code'])
+        self.assertEquals((cache.hits, cache.misses), (1, 1))
+
+    @mock.patch('pybrightcove.checksum.MMAP_BLOCK_SIZE', 4096)
+    @mock.patch('pybrightcove.checksum.MMAP_THRESHOLD', 1024)
+    def test_mmap(self):
+        self.assertEquals(checksum.compute_md5(self.filename),
+            hashlib.md5('bears' * 100000).hexdigest())
+
+
+class HashEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.engine = HashEngine(workers=2, cache=mock.Mock())
+        self.engine.cache.md5.side_effect = self._md5
+
+    def tearDown(self):
+        self.release.set()
+        self.engine.close()
+
+    def _md5(self, path):
+        self.release.wait()
+        return os.path.basename(path)
+
+    def test_submit_returns_immediately(self):
+        first = self.engine.submit('a.mov')
+        second = self.engine.submit('b.mov')
+        self.assertFalse(first.ready())
+        self.assertTrue(self.engine.submit('a.mov') is first)
+        self.release.set()
+        self.assertEquals((first.get(1), second.get(1)), ('a.mov', 'b.mov'))
+        self.assertEquals(self.engine.cache.md5.call_count, 2)
+        self.assertEquals(self.engine.pending('a.mov'), None)
+
+    def test_add_asset_does_not_wait(self):
+        from pybrightcove import video, connection
+        v = video.Video(name='Bears', short_description='Bears',
+            reference_id='bears',
+            _connection=connection.FTPConnection(host='host'))
+        with mock.patch('pybrightcove.checksum._engine', self.engine):
+            with mock.patch('os.path.getsize') as GetSizeMock:
+                GetSizeMock.return_value = 10
+                v.add_asset('bears.mov', 'VIDEO_FULL', 'Bears')
+                v.add_asset('bears.png', 'VIDEO_STILL', 'Still')
+        self.assertEquals(v.assets[0]['hash-code'], None)
+        self.release.set()
+        xml = v.to_xml()
+        self.assertTrue('refid="bears.mov-bears.mov"' in xml)
+        self.assertEquals(v.assets[1]['hash-code'], 'bears.png')
+        self.assertFalse('_checksum' in v.assets[1])
+
+    def test_failed_checksum_raised_again(self):
+        from pybrightcove import video, connection
+        v = video.Video(name='Bears', short_description='Bears',
+            reference_id='bears',
+            _connection=connection.FTPConnection(host='host'))
+        self.engine.cache.md5.side_effect = IOError(2, 'No such file')
+        with mock.patch('pybrightcove.checksum._engine', self.engine):
+            with mock.patch('os.path.getsize') as GetSizeMock:
+                GetSizeMock.return_value = 10
+                v.add_asset('bears.mov', 'VIDEO_FULL', 'Bears')
+        self.assertRaises(IOError, v.to_xml)
+        self.assertRaises(IOError, v.to_xml)
+        self.assertEquals(v.assets[0]['hash-code'], None)
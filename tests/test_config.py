@@ -0,0 +1,78 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+from pybrightcove import config
+
+
+class ConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'pybrightcove.cfg')
+        self._write("[Connection]\nread_token = 'abc'\n")
+        self.locations = mock.patch('pybrightcove.config.CONFIG_LOCATIONS',
+            [self.path])
+        self.locations.start()
+        config.reload()
+
+    def tearDown(self):
+        self.locations.stop()
+        config.reload()
+        shutil.rmtree(self.dir)
+
+    def _write(self, text, mtime=None):
+        f = open(self.path, 'w')
+        f.write(text)
+        f.close()
+        if mtime:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_get(self):
+        self.assertTrue(config.has_option('Connection', 'read_token'))
+        self.assertFalse(config.has_option('Connection', 'write_token'))
+        self.assertEquals(config.get('Connection', 'read_token'), 'abc')
+        self.assertEquals(config.get('Connection', 'working_dir'), '/tmp')
+
+    @mock.patch('ConfigParser.SafeConfigParser.read')
+    def test_parsed_once(self, ReadMock):
+        for i in range(10):
+            config.has_option('Connection', 'read_token')
+        self.assertEquals(ReadMock.call_count, 1)
+
+    @mock.patch('time.time')
+    def test_reload_on_mtime_change(self, TimeMock):
+        TimeMock.return_value = 1000
+        self._write("[Connection]\nread_token = abc\n", mtime=500)
+        config.reload()
+        self.assertEquals(config.get('Connection', 'read_token'), 'abc')
+        self._write("[Connection]\nread_token = def\n", mtime=600)
+        self.assertEquals(config.get('Connection', 'read_token'), 'abc')
+        TimeMock.return_value = 1000 + config.CHECK_INTERVAL
+        self.assertEquals(config.get('Connection', 'read_token'), 'def')
+
+    @mock.patch.dict(os.environ, {'PYBRIGHTCOVE_CONNECTION_WRITE_TOKEN': 'w'})
+    def test_environment_override(self):
+        self.assertTrue(config.has_option('Connection', 'write_token'))
+        self.assertEquals(config.get('Connection', 'write_token'), 'w')
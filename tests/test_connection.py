@@ -1,7 +1,20 @@
+import os
+import stat
+import errno
+import time
+import socket
+import tempfile
+import itertools
+import threading
 import unittest
 import uuid
+import hashlib
+import urllib2
+import StringIO
+import simplejson
 from datetime import datetime, timedelta
 import pybrightcove
+from pybrightcove import http_core
 import mock
 
 # httplib.HTTPConnection
@@ -32,20 +45,29 @@ class APIConnectionTest(unittest.TestCase):
         except pybrightcove.exceptions.ImproperlyConfiguredError:
             pass
 
-    @mock.patch('urllib2.urlopen')
-    def test_post(self, UrlOpenMock):
-        u = UrlOpenMock()
-        u.read.return_value = '{"result": {"status": "OK"}}'
+    def _response_mock(self, HTTPMock, body):
+        h = HTTPMock()
+        h.host = 'api.brightcove.com'
+        r = h.getresponse.return_value
+        r.status = 200
+        r.will_close = True
+        r.getheaders.return_value = []
+        r.read.return_value = body
+        return h
+
+    @mock.patch('httplib.HTTPConnection')
+    def test_post(self, HTTPMock):
+        h = self._response_mock(HTTPMock, '{"result": {"status": "OK"}}')
         d = self.api.post('get_upload_status', video_id=1000)
         self.assertEquals(d, {"status": "OK"})
+        self.assertEquals(h.putrequest.call_args[0], ('POST', '/services/post'))
 
     @mock.patch('httplib.HTTPConnection')
     @mock.patch('os.fstat')
     @mock.patch("__builtin__.file")
     def test_post_file(self, FileMock, FDStatMock, HTTPMock):
-        h = HTTPMock()
-        h.getresponse.return_value.read.return_value = '{"result": {"video": 1}}'
-        FDStatMock.return_value = [0, 1, 2, 3, 4, 5, 1000]
+        h = self._response_mock(HTTPMock, '{"result": {"video": 1}}')
+        FDStatMock.return_value = [stat.S_IFREG, 1, 2, 3, 4, 5, 1000]
         f = FileMock()
         f.name = 'bears.mov'
         f.read.return_value = ''
@@ -60,21 +82,752 @@ class APIConnectionTest(unittest.TestCase):
                 video=video._to_dict())
         self.assertEquals(vid, {"video": 1})
 
-    @mock.patch('urllib2.urlopen')
-    def test_get_list(self, UrlOpenMock):
-        u = UrlOpenMock()
-        u.read.return_value = '{"result": {"status": "OK"}}'
+    @mock.patch('httplib.HTTPConnection')
+    def test_get_list(self, HTTPMock):
+        h = self._response_mock(HTTPMock, '{"result": {"status": "OK"}}')
         d = self.api.get_item('get_video', video_id=1000)
         self.assertEquals(d, {"result": {"status": "OK"}})
+        method, path = h.putrequest.call_args[0]
+        self.assertEquals(method, 'GET')
+        self.assertTrue(path.startswith('/services/library?'))
+        self.assertTrue('command=get_video' in path)
+        self.assertTrue('video_id=1000' in path)
 
-    @mock.patch('urllib2.urlopen')
-    def test_get_item(self, UrlOpenMock):
-        u = UrlOpenMock()
-        
-        u.read.return_value = '{"total_count": 5, "page_number": 2, "page_size": 10, "items":[]}'
+    @mock.patch('httplib.HTTPConnection')
+    def test_get_item(self, HTTPMock):
+        self._response_mock(HTTPMock,
+            '{"total_count": 5, "page_number": 2, "page_size": 10, "items":[]}')
         d = self.api.get_list('whatever_list', pybrightcove.video.Video, 10, 2, pybrightcove.enums.DEFAULT_SORT_BY, pybrightcove.enums.DEFAULT_SORT_ORDER)
         self.assertEquals(d.data, {"total_count": 5, "page_number": 2, "page_size": 10, "items":[]})
         self.assertEquals(d.page_size, 10)
         self.assertEquals(d.total_count, 5)
         self.assertEquals(d.page_number, 2)
 
+
+    @mock.patch('httplib.HTTPConnection')
+    def test_http_error(self, HTTPMock):
+        h = self._response_mock(HTTPMock, 'Service Unavailable')
+        h.getresponse.return_value.status = 503
+        self.assertRaises(urllib2.HTTPError, self.api.get_item, 'get_video',
+            video_id=1000)
+
+
+class SendDataPartTest(unittest.TestCase):
+
+    def setUp(self):
+        self.body = tempfile.TemporaryFile()
+        self.body.write('bears' * 300000)
+        self.body.seek(5)
+
+    def _read_all(self, sock, size):
+        data = []
+        while size:
+            chunk = sock.recv(size)
+            data.append(chunk)
+            size -= len(chunk)
+        return ''.join(data)
+
+    def test_sendfile(self):
+        if http_core.SENDFILE is None:
+            return
+        client, server = socket.socketpair()
+        connection = mock.Mock()
+        connection.sock = client
+        connection.debuglevel = 0
+        received = []
+        reader = threading.Thread(target=lambda: received.append(
+            self._read_all(server, 1499995)))
+        reader.start()
+        http_core._send_data_part(self.body, connection)
+        reader.join()
+        self.assertEquals(received[0], ('bears' * 300000)[5:])
+        self.assertFalse(connection.send.called)
+        self.assertEquals(self.body.tell(), 1500000)
+        client.close()
+        server.close()
+
+    @mock.patch('pybrightcove.http_core.SENDFILE', None)
+    def test_readinto_fallback(self):
+        connection = mock.Mock()
+        sent = []
+        connection.send.side_effect = lambda data: sent.append(data.tobytes())
+        http_core._send_data_part(self.body, connection)
+        self.assertEquals(''.join(sent), ('bears' * 300000)[5:])
+        self.assertEquals(len(sent), 2)
+
+
+class ChunkedBodyTest(unittest.TestCase):
+
+    def _sent(self, req):
+        connection = mock.Mock()
+        sent = []
+        connection.send.side_effect = sent.append
+        http_core._send_body(req._body_parts, req.headers, connection)
+        return ''.join(sent)
+
+    def test_iterable_part(self):
+        req = http_core.HttpRequest(http_core.Uri.parse_uri('http://a/b'))
+        req.add_body_part('JSONRPC', '{}', 'text/plain')
+        self.assertEquals(req.headers['Content-Length'],
+            str(len(''.join(req._body_parts))))
+        req.add_body_part('filePath', iter(['bears', 'cubs']),
+            'application/octet-stream', filename='bears.mov')
+        req.end_of_parts()
+        self.assertEquals(req.headers['Transfer-Encoding'], 'chunked')
+        self.assertFalse('Content-Length' in req.headers)
+        self.assertTrue('filename="bears.mov"' in req._body_parts[5])
+        self.assertTrue('video/quicktime' in req._body_parts[6])
+        body = self._sent(req)
+        self.assertTrue('\r\n5\r\nbears\r\n4\r\ncubs\r\n' in body)
+        self.assertTrue(body.endswith('\r\n0\r\n\r\n'))
+
+    def test_pipe_part(self):
+        rfd, wfd = os.pipe()
+        os.write(wfd, 'bears' * 10)
+        os.close(wfd)
+        pipe = os.fdopen(rfd, 'rb')
+        req = http_core.HttpRequest(http_core.Uri.parse_uri('http://a/b'))
+        req.add_body_part('filePath', pipe, 'application/octet-stream')
+        self.assertEquals(req.headers['Transfer-Encoding'], 'chunked')
+        body = self._sent(req)
+        pipe.close()
+        self.assertTrue('\r\n32\r\n%s\r\n' % ('bears' * 10) in body)
+
+    def test_known_size_not_chunked(self):
+        req = http_core.HttpRequest(http_core.Uri.parse_uri('http://a/b'))
+        req.add_body_part('filePath', iter(['bears']),
+            'application/octet-stream', size=5)
+        self.assertFalse('Transfer-Encoding' in req.headers)
+        self.assertEquals(self._sent(req).split('\r\n\r\n')[-1], 'bears')
+
+    def _post(self, HTTPMock, upload):
+        api = pybrightcove.connection.APIConnection(read_token="read",
+            write_token="write")
+        h = HTTPMock()
+        h.host = 'api.brightcove.com'
+        h.sock = None
+        r = h.getresponse.return_value
+        r.status = 200
+        r.will_close = True
+        r.getheaders.return_value = []
+        r.read.return_value = '{"result": 10}'
+        sent = []
+        h.send.side_effect = lambda data: sent.append(str(data))
+        self.assertEquals(api.post('create_video', upload, video={}), 10)
+        return h, ''.join(sent)
+
+    @mock.patch('httplib.HTTPConnection')
+    def test_post_stream(self, HTTPMock):
+        stream = pybrightcove.checksum.HashingReader(
+            StringIO.StringIO('bears' * 1000), name='/tmp/bears.mov')
+        h, body = self._post(HTTPMock, stream)
+        h.putheader.assert_any_call('Transfer-Encoding', 'chunked')
+        self.assertTrue('filename="bears.mov"' in body)
+        self.assertFalse('file_checksum' in body)
+        self.assertTrue(('bears' * 1000) in body)
+        self.assertEquals(stream.hexdigest(),
+            hashlib.md5('bears' * 1000).hexdigest())
+
+    @mock.patch('httplib.HTTPConnection')
+    def test_post_unnamed_stream(self, HTTPMock):
+        h, body = self._post(HTTPMock, iter(['bears', 'cubs']))
+        self.assertTrue('name="filePath"; filename="upload"' in body)
+        self.assertTrue('\r\n5\r\nbears\r\n4\r\ncubs\r\n' in body)
+
+    @mock.patch('httplib.HTTPConnection')
+    def test_post_pipe(self, HTTPMock):
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, 'bears' * 1000)
+        os.close(write_fd)
+        pipe = os.fdopen(read_fd, 'rb')
+        h, body = self._post(HTTPMock, pipe)
+        pipe.close()
+        h.putheader.assert_any_call('Transfer-Encoding', 'chunked')
+        self.assertTrue('name="filePath"; filename="upload"' in body)
+        self.assertFalse('<fdopen>' in body)
+        self.assertTrue(('bears' * 1000) in body)
+
+    @mock.patch('httplib.HTTPConnection')
+    def test_post_open_file(self, HTTPMock):
+        upload = tempfile.NamedTemporaryFile(suffix='.mov')
+        upload.write('bears' * 1000)
+        upload.flush()
+        upload.seek(0)
+        h, body = self._post(HTTPMock, upload)
+        upload.close()
+        headers = dict(call[0] for call in h.putheader.call_args_list)
+        self.assertFalse('Transfer-Encoding' in headers)
+        self.assertEquals(int(headers['Content-Length']), len(body))
+        self.assertTrue('filename="%s"' % os.path.basename(upload.name)
+            in body)
+        self.assertTrue(('bears' * 1000) in body)
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = http_core.ConnectionPool(max_size=2, idle_timeout=30)
+        self.uri = http_core.Uri.parse_uri('http://api.brightcove.com/services/library')
+
+    def _connection(self, alive=True):
+        c = mock.Mock()
+        c.host = 'api.brightcove.com'
+        r = c.getresponse.return_value
+        r.status = 200
+        r.will_close = False
+        r.getheaders.return_value = []
+        r.read.return_value = '{}'
+        return c
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    def test_reuse(self, AliveMock):
+        AliveMock.return_value = True
+        c = self._connection()
+        self.pool.put(self.uri, c)
+        self.assertEquals(self.pool.size(), 1)
+        self.assertTrue(self.pool.get(self.uri) is c)
+        self.assertEquals(self.pool.get(self.uri), None)
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    def test_keyed_by_scheme_host_port(self, AliveMock):
+        AliveMock.return_value = True
+        self.pool.put(self.uri, self._connection())
+        other = http_core.Uri.parse_uri('https://api.brightcove.com/services/post')
+        self.assertEquals(self.pool.get(other), None)
+        same = http_core.Uri.parse_uri('http://api.brightcove.com:80/services/post')
+        self.assertNotEquals(self.pool.get(same), None)
+
+    def test_max_size(self):
+        connections = [self._connection() for i in range(3)]
+        for c in connections:
+            self.pool.put(self.uri, c)
+        self.assertEquals(self.pool.size(), 2)
+        self.assertTrue(connections[2].close.called)
+
+    @mock.patch('time.time')
+    def test_idle_eviction(self, TimeMock):
+        TimeMock.return_value = 1000
+        c = self._connection()
+        self.pool.put(self.uri, c)
+        TimeMock.return_value = 1031
+        self.pool.evict_idle()
+        self.assertEquals(self.pool.size(), 0)
+        self.assertTrue(c.close.called)
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    def test_health_check(self, AliveMock):
+        AliveMock.return_value = False
+        c = self._connection()
+        self.pool.put(self.uri, c)
+        self.assertEquals(self.pool.get(self.uri), None)
+        self.assertTrue(c.close.called)
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    @mock.patch('httplib.HTTPConnection')
+    def test_client_keeps_connection_alive(self, HTTPMock, AliveMock):
+        AliveMock.return_value = True
+        c = self._connection()
+        HTTPMock.return_value = c
+        client = http_core.PooledHttpClient(self.pool)
+        client.request(http_core.HttpRequest(str(self.uri), 'GET'))
+        client.request(http_core.HttpRequest(str(self.uri), 'GET'))
+        self.assertEquals(HTTPMock.call_count, 1)
+        self.assertEquals(c.putrequest.call_count, 2)
+        self.assertTrue(('Connection', 'keep-alive') in
+            [call[0] for call in c.putheader.call_args_list])
+        self.assertEquals(self.pool.size(), 1)
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    @mock.patch('httplib.HTTPConnection')
+    def test_client_replaces_stale_connection(self, HTTPMock, AliveMock):
+        AliveMock.return_value = True
+        stale = self._connection()
+        stale.endheaders.side_effect = socket.error(errno.EPIPE, 'Broken pipe')
+        self.pool.put(self.uri, stale)
+        fresh = self._connection()
+        HTTPMock.return_value = fresh
+        client = http_core.PooledHttpClient(self.pool)
+        response = client.request(http_core.HttpRequest(str(self.uri), 'GET'))
+        self.assertEquals(response.read(), '{}')
+        self.assertTrue(stale.close.called)
+        self.assertEquals(fresh.putrequest.call_count, 1)
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    @mock.patch('httplib.HTTPConnection')
+    def test_client_resends_get_when_idle_connection_dropped(self, HTTPMock,
+            AliveMock):
+        for error in (http_core.httplib.BadStatusLine("''"),
+                socket.error(errno.ECONNRESET, 'Connection reset by peer')):
+            AliveMock.return_value = True
+            stale = self._connection()
+            stale.getresponse.side_effect = error
+            self.pool.put(self.uri, stale)
+            fresh = self._connection()
+            HTTPMock.return_value = fresh
+            client = http_core.PooledHttpClient(self.pool)
+            response = client.request(
+                http_core.HttpRequest(str(self.uri), 'GET'))
+            self.assertEquals(response.read(), '{}')
+            self.assertTrue(stale.close.called)
+            self.assertEquals(fresh.putrequest.call_count, 1)
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    def test_client_resends_get_when_server_drops_idle_socket(self,
+            AliveMock):
+        # The server closes each connection after one response, as it would
+        # once the keep-alive timeout expires, and the health check misses it.
+        AliveMock.return_value = True
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(2)
+        listener.settimeout(5)
+        def serve():
+            for i in range(2):
+                try:
+                    conn = listener.accept()[0]
+                except socket.timeout:
+                    return
+                conn.recv(4096)
+                conn.sendall('HTTP/1.1 200 OK\r\nContent-Length: 4\r\n'
+                    'Connection: keep-alive\r\n\r\n{"a"')
+                conn.close()
+        server = threading.Thread(target=serve)
+        server.start()
+        uri = 'http://127.0.0.1:%d/services/library' % \
+            listener.getsockname()[1]
+        client = http_core.PooledHttpClient(self.pool)
+        try:
+            first = client.request(http_core.HttpRequest(uri, 'GET'))
+            self.assertEquals(self.pool.size(), 1)
+            time.sleep(0.05)
+            second = client.request(http_core.HttpRequest(uri, 'GET'))
+        finally:
+            server.join()
+            listener.close()
+        self.assertEquals(first.read(), '{"a"')
+        self.assertEquals(second.read(), '{"a"')
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    @mock.patch('httplib.HTTPConnection')
+    def test_client_resends_get_once(self, HTTPMock, AliveMock):
+        AliveMock.return_value = True
+        stale = self._connection()
+        stale.getresponse.side_effect = http_core.httplib.BadStatusLine("''")
+        self.pool.put(self.uri, stale)
+        fresh = self._connection()
+        fresh.getresponse.side_effect = http_core.httplib.BadStatusLine("''")
+        HTTPMock.return_value = fresh
+        client = http_core.PooledHttpClient(self.pool)
+        self.assertRaises(http_core.httplib.BadStatusLine, client.request,
+            http_core.HttpRequest(str(self.uri), 'GET'))
+        self.assertEquals(HTTPMock.call_count, 1)
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    @mock.patch('httplib.HTTPConnection')
+    def test_client_does_not_resend_sent_post(self, HTTPMock, AliveMock):
+        AliveMock.return_value = True
+        stale = self._connection()
+        stale.getresponse.side_effect = http_core.httplib.BadStatusLine("''")
+        self.pool.put(self.uri, stale)
+        client = http_core.PooledHttpClient(self.pool)
+        request = http_core.HttpRequest(str(self.uri), 'POST')
+        request._body_parts.append('json=%7B%7D')
+        self.assertRaises(http_core.httplib.BadStatusLine, client.request,
+            request)
+        self.assertTrue(stale.close.called)
+        self.assertFalse(HTTPMock.called)
+
+    @mock.patch('pybrightcove.http_core._is_connection_alive')
+    @mock.patch('httplib.HTTPConnection')
+    def test_client_does_not_resend_post(self, HTTPMock, AliveMock):
+        AliveMock.return_value = True
+        stale = self._connection()
+        stale.endheaders.side_effect = socket.error(errno.ECONNRESET,
+            'Connection reset by peer')
+        self.pool.put(self.uri, stale)
+        client = http_core.PooledHttpClient(self.pool)
+        request = http_core.HttpRequest(str(self.uri), 'POST')
+        request._body_parts.append('json=%7B%7D')
+        self.assertRaises(socket.error, client.request, request)
+        self.assertFalse(HTTPMock.called)
+
+
+class ItemResultSetPrefetchTest(unittest.TestCase):
+
+    def _connection(self, total_count, page_size):
+        def get_list(command, page_size, page_number, **kwargs):
+            c = mock.Mock()
+            start = page_number * page_size
+            c.items = range(start, min(start + page_size, total_count))
+            c.total_count = total_count
+            c.page_size = page_size
+            return c
+        m = mock.Mock()
+        m.get_list.side_effect = get_list
+        return m
+
+    def test_prefetch_preserves_order(self):
+        m = self._connection(total_count=95, page_size=10)
+        result_set = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, m, page_size=10, workers=4)
+        self.assertEquals(list(result_set), range(95))
+        pages = sorted([c[1]['page_number'] for c in m.get_list.call_args_list])
+        self.assertEquals(pages, range(11))
+        self.assertEquals(result_set.total_count, 95)
+
+    def test_prefetch_matches_serial(self):
+        serial = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, self._connection(42, 5), page_size=5,
+            page_number=2)
+        prefetched = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, self._connection(42, 5), page_size=5,
+            page_number=2, workers=3)
+        self.assertEquals(list(prefetched), list(serial))
+
+    def test_prefetch_empty(self):
+        m = self._connection(total_count=0, page_size=10)
+        result_set = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, m, workers=4)
+        self.assertEquals(list(result_set), [])
+        self.assertEquals(m.get_list.call_count, 1)
+
+
+class AdaptiveItemResultSetTest(unittest.TestCase):
+
+    def _connection(self, total_count, max_page_size=100):
+        def get_list(command, page_size, page_number, **kwargs):
+            if page_size > max_page_size:
+                raise pybrightcove.exceptions.CallTimeoutError()
+            c = mock.Mock()
+            start = page_number * page_size
+            c.items = range(start, min(start + page_size, total_count))
+            c.total_count = total_count
+            c.page_size = page_size
+            return c
+        m = mock.Mock()
+        m.get_list.side_effect = get_list
+        return m
+
+    def _page_sizes(self, m):
+        return [c[1]['page_size'] for c in m.get_list.call_args_list]
+
+    def test_grows_when_fast(self):
+        m = self._connection(total_count=437)
+        result_set = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, m, page_size=10, adaptive=True)
+        self.assertEquals(list(result_set), range(437))
+        sizes = self._page_sizes(m)
+        self.assertEquals(sizes[0], 10)
+        self.assertEquals(max(sizes), 100)
+
+    def test_shrinks_on_timeout(self):
+        m = self._connection(total_count=137, max_page_size=25)
+        result_set = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, m, page_size=100, page_number=0,
+            adaptive=True)
+        self.assertEquals(list(result_set), range(137))
+        self.assertEquals(self._page_sizes(m)[:3], [100, 50, 25])
+
+    @mock.patch('time.time')
+    def test_shrinks_when_slow(self, TimeMock):
+        TimeMock.side_effect = itertools.count(0, 20)
+        m = self._connection(total_count=100)
+        result_set = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, m, page_size=50, page_number=1,
+            adaptive=True)
+        self.assertEquals(list(result_set), range(50, 100))
+        self.assertEquals(self._page_sizes(m)[:2], [50, 25])
+
+    def test_page_sizes_not_dividing_offset(self):
+        m = self._connection(total_count=100)
+        result_set = mock.Mock(pages=0)
+        items = pybrightcove.connection.adaptive_item_lister('find_all_videos',
+            m, 30, 1, None, None, pybrightcove.video.Video, result_set,
+            page_sizes=(25, 50))
+        self.assertEquals(list(items), range(30, 100))
+        self.assertEquals(self._page_sizes(m)[0], 30)
+        self.assertEquals(m.get_list.call_args_list[0][1]['page_number'], 1)
+
+    def test_timed_out_size_not_tried_again(self):
+        m = self._connection(total_count=300, max_page_size=10)
+        result_set = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, m, page_size=10, adaptive=True)
+        self.assertEquals(list(result_set), range(300))
+        # Each size above the limit times out once at most, however long
+        # the listing goes on: 30 full pages, an empty one and the timeouts.
+        timeouts = [size for size in self._page_sizes(m) if size > 10]
+        self.assertEquals(len(timeouts), len(set(timeouts)))
+        self.assertEquals(len(self._page_sizes(m)), 31 + len(timeouts))
+
+    def test_timeout_at_smallest_size(self):
+        m = self._connection(total_count=10, max_page_size=0)
+        result_set = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, m, page_size=5, adaptive=True)
+        self.assertRaises(pybrightcove.exceptions.CallTimeoutError, list,
+            result_set)
+
+
+class CoalescingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = pybrightcove.connection.APIConnection(read_token="read")
+        self.release = threading.Event()
+        self.api._call = mock.Mock(side_effect=self._call)
+        self.results = []
+        self.errors = []
+
+    def _call(self, command, build_request, decode, **kwargs):
+        self.release.wait()
+        if self.api._call.call_count == 1 and getattr(self, 'error', None):
+            raise self.error
+        body = '{"id": %d}' % self.api._call.call_count
+        return body, decode(body)
+
+    def _get(self, video_id=1):
+        try:
+            self.results.append(
+                self.api.get_item('find_video_by_id', video_id=video_id))
+        except Exception, e:
+            self.errors.append(e)
+
+    def _run(self, ids):
+        threads = [threading.Thread(target=self._get, args=(i, ))
+            for i in ids]
+        threads[0].start()
+        while not self.api._inflight:
+            time.sleep(0.001)
+        for t in threads[1:]:
+            t.start()
+        time.sleep(0.05)
+        self.release.set()
+        for t in threads:
+            t.join()
+
+    def test_identical_reads_share_one_call(self):
+        self._run([1] * 5)
+        self.assertEquals(self.api._call.call_count, 1)
+        self.assertEquals(self.results, [{'id': 1}] * 5)
+        self.assertEquals(len(set(map(id, self.results))), 5)
+        self.assertEquals(self.api._inflight, {})
+
+    def test_different_reads_are_not_coalesced(self):
+        self._run([1, 2])
+        self.assertEquals(self.api._call.call_count, 2)
+
+    def test_error_is_shared(self):
+        self.error = pybrightcove.exceptions.UnknownServerError()
+        self._run([1] * 3)
+        self.assertEquals(self.errors, [self.error] * 3)
+        self._get()
+        self.assertEquals(self.results, [{'id': 2}])
+
+    def test_disabled(self):
+        self.api.coalesce = False
+        self.release.set()
+        self._get()
+        self._get()
+        self.assertEquals(self.api._call.call_count, 2)
+
+
+class AsyncAPIConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = mock.Mock()
+        self.async_api = pybrightcove.connection.AsyncAPIConnection(
+            self.api, workers=4)
+
+    def tearDown(self):
+        self.async_api.close()
+
+    def test_get_item(self):
+        self.api.get_item.return_value = {"id": 1}
+        results = []
+        r = self.async_api.get_item('find_video_by_id', video_id=1,
+            callback=results.append)
+        self.assertEquals(r.get(5), {"id": 1})
+        self.assertEquals(results, [{"id": 1}])
+        self.api.get_item.assert_called_with('find_video_by_id', video_id=1)
+
+    def test_post(self):
+        self.api.post.return_value = 10
+        r = self.async_api.post('delete_video', video_id=1)
+        self.assertEquals(r.get(5), 10)
+        self.api.post.assert_called_with('delete_video', None, video_id=1)
+
+    def test_error(self):
+        self.api.get_item.side_effect = \
+            pybrightcove.exceptions.InvalidTokenError()
+        r = self.async_api.get_item('find_video_by_id', video_id=1)
+        self.assertRaises(pybrightcove.exceptions.InvalidTokenError, r.get, 5)
+
+    def test_list(self):
+        c = mock.Mock()
+        c.items = [1, 2, 3]
+        c.total_count = 3
+        c.page_size = 0
+        self.api.get_list.return_value = c
+        result_set = pybrightcove.video.Video.find_all(_connection=self.api)
+        self.assertEquals(self.async_api.list(result_set).get(5), [1, 2, 3])
+
+    def test_find_video(self):
+        from tests.test_video import VIDEO_DATA
+        self.api.get_item.return_value = VIDEO_DATA
+        video = self.async_api.find_video(id=VIDEO_DATA['id']).get(5)
+        self.assertEquals(video.name, VIDEO_DATA['name'])
+        self.assertTrue(video.connection is self.api)
+
+
+class BatchItemResultSetTest(unittest.TestCase):
+
+    def test_chunk_ids(self):
+        chunks = pybrightcove.connection.chunk_ids(range(7), 3, 100)
+        self.assertEquals(chunks, [['0', '1', '2'], ['3', '4', '5'], ['6']])
+        chunks = pybrightcove.connection.chunk_ids(['aaaa', 'bbbb', 'cc'], 10, 11)
+        self.assertEquals(chunks, [['aaaa', 'bbbb'], ['cc']])
+        chunks = pybrightcove.connection.chunk_ids(['a,b', 'c d', 'e/f'], 10, 16)
+        self.assertEquals(chunks, [['a,b', 'c d'], ['e/f']])
+
+    def test_chunked_in_input_order(self):
+        def get_list(command, page_size, page_number, video_ids, **kwargs):
+            c = mock.Mock()
+            c.items = []
+            for i in reversed(video_ids.split(',')):
+                item = mock.Mock()
+                item.id = int(i)
+                c.items.append(item)
+            c.total_count = len(c.items)
+            c.page_size = 0
+            return c
+        m = mock.Mock()
+        m.get_list.side_effect = get_list
+        ids = range(1000, 1120)
+        videos = pybrightcove.video.Video.find_by_ids(ids, _connection=m,
+            chunk_size=25, workers=3)
+        self.assertEquals([v.id for v in videos], ids)
+        self.assertEquals(videos.total_count, 120)
+        self.assertEquals(m.get_list.call_count, 5)
+        for call in m.get_list.call_args_list:
+            self.assertTrue(len(call[1]['video_ids'].split(',')) <= 25)
+            self.assertEquals(call[1]['page_number'], 0)
+
+    def test_page_number_applies_to_merged_result(self):
+        def get_list(command, page_size, page_number, video_ids, **kwargs):
+            c = mock.Mock()
+            c.items = []
+            for i in video_ids.split(','):
+                item = mock.Mock()
+                item.id = int(i)
+                c.items.append(item)
+            c.total_count = len(c.items)
+            c.page_size = 0
+            return c
+        m = mock.Mock()
+        m.get_list.side_effect = get_list
+        ids = range(1000, 1120)
+        videos = pybrightcove.video.Video.find_by_ids(ids, _connection=m,
+            chunk_size=25, workers=3, page_size=30, page_number=1)
+        self.assertEquals([v.id for v in videos], ids[30:])
+        for call in m.get_list.call_args_list:
+            self.assertEquals(call[1]['page_number'], 0)
+
+
+class StreamingItemCollectionTest(unittest.TestCase):
+
+    def _page(self, items, total_count, page_size=2, page_number=0):
+        from tests.test_video import VIDEO_DATA
+        data = []
+        for i in items:
+            video = dict(VIDEO_DATA)
+            video['id'] = i
+            data.append(video)
+        body = simplejson.dumps({'items': data, 'page_number': page_number,
+            'page_size': page_size, 'total_count': total_count})
+        return StringIO.StringIO(body)
+
+    def test_items_are_decoded_incrementally(self):
+        response = self._page([1, 2], 2)
+        collection = pybrightcove.connection.StreamingItemCollection(
+            response, pybrightcove.video.Video, mock.Mock(), chunk_size=64)
+        self.assertEquals(collection.total_count, None)
+        first = collection.items.next()
+        self.assertEquals(first.id, 1)
+        self.assertTrue(response.tell() < len(response.getvalue()))
+        self.assertEquals([v.id for v in collection.items], [2])
+        self.assertEquals(collection.total_count, 2)
+        self.assertEquals(collection.page_size, 2)
+        self.assertTrue(response.closed)
+
+    def test_scalars_split_across_chunks(self):
+        body = '{"items": [1.5, -20, 3e2, 1234567, "a", true, null], ' \
+            '"total_count": 7}'
+        for chunk_size in range(1, len(body) + 1):
+            stream = pybrightcove.connection.JSONStream(
+                StringIO.StringIO(body), chunk_size=chunk_size)
+            self.assertEquals(list(stream.members('items')), [
+                ('items', 1.5), ('items', -20), ('items', 300.0),
+                ('items', 1234567), ('items', 'a'), ('items', True),
+                ('items', None), ('total_count', 7)])
+        for chunk_size in range(1, 8):
+            stream = pybrightcove.connection.JSONStream(
+                StringIO.StringIO(' 12.25 '), chunk_size=chunk_size)
+            self.assertEquals(list(stream.members('items')), [(None, 12.25)])
+
+    def test_error(self):
+        response = StringIO.StringIO(
+            '{"error": {"code": 103, "message": "timeout"}, "result": null}')
+        collection = pybrightcove.connection.StreamingItemCollection(
+            response, pybrightcove.video.Video, mock.Mock())
+        self.assertRaises(pybrightcove.exceptions.CallTimeoutError, list,
+            collection.items)
+
+    def test_streaming_result_set(self):
+        pages = [self._page([1, 2], 3), self._page([3], 3, page_number=1),
+            self._page([], 3, page_number=2)]
+        m = mock.Mock()
+        m.stream_list.side_effect = lambda *args, **kwargs: \
+            pybrightcove.connection.StreamingItemCollection(pages.pop(0),
+                pybrightcove.video.Video, m)
+        result_set = pybrightcove.video.Video.find_all(_connection=m,
+            page_size=2)
+        result_set.stream = True
+        self.assertEquals([v.id for v in result_set], [1, 2, 3])
+        self.assertEquals(result_set.total_count, 3)
+        self.assertFalse(m.get_list.called)
+
+
+class DefaultConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        pybrightcove.connection.set_default_connection(None)
+
+    def tearDown(self):
+        pybrightcove.connection.set_default_connection(None)
+        pybrightcove.connection.set_default_connection(None, thread_local=True)
+
+    @mock.patch('pybrightcove.connection.APIConnection')
+    def test_shared(self, ConnectionMock):
+        from tests.test_video import VIDEO_DATA
+        videos = [pybrightcove.video.Video(data=VIDEO_DATA) for i in range(5)]
+        self.assertEquals(ConnectionMock.call_count, 1)
+        self.assertTrue(videos[0].connection is videos[4].connection)
+        result_set = pybrightcove.video.Video.find_all()
+        self.assertTrue(result_set._connection is videos[0].connection)
+        self.assertEquals(ConnectionMock.call_count, 1)
+
+    def test_set_default(self):
+        api = mock.Mock()
+        pybrightcove.connection.set_default_connection(api)
+        self.assertTrue(pybrightcove.connection.get_default_connection() is api)
+
+    def test_thread_local(self):
+        import threading
+        shared, local = mock.Mock(), mock.Mock()
+        pybrightcove.connection.set_default_connection(shared)
+        pybrightcove.connection.set_default_connection(local, thread_local=True)
+        seen = []
+        t = threading.Thread(target=lambda: seen.append(
+            pybrightcove.connection.get_default_connection()))
+        t.start()
+        t.join()
+        self.assertTrue(seen[0] is shared)
+        self.assertTrue(pybrightcove.connection.get_default_connection() is local)
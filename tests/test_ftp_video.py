@@ -20,34 +20,46 @@
 # THE SOFTWARE.
 
 import os
+import re
+import ftplib
+import threading
 from xml.dom import minidom
 import unittest
 import mock
-from pybrightcove import video, enums, connection
+from pybrightcove import video, enums, connection, exceptions, retry
 
 
 class FTPVideoTest(unittest.TestCase):
 
+    def _ftp_mock(self, FTPMockClass):
+        f = FTPMockClass()
+        f.size.return_value = None
+        f.manifests = []
+        def storbinary(command, upload, rest=None):
+            if command.endswith('.xml'):
+                f.manifests.append(upload.getvalue())
+        f.storbinary.side_effect = storbinary
+        return f
+
     @mock.patch('ftplib.FTP')
     @mock.patch('hashlib.md5') # md5(), md5.hexdigest
     @mock.patch('os.path.getsize')
     @mock.patch('__builtin__.file')
-    @mock.patch("os.fdopen")
-    def test_batch_provision_video(self, FDOpenMockClass, OpenMockClass, GetSizeMockClass, Md5MockClass, FTPMockClass):
-        fd = FDOpenMockClass()
+    def test_batch_provision_video(self, OpenMockClass, GetSizeMockClass, Md5MockClass, FTPMockClass):
         o = OpenMockClass()
         o.read.return_value = None
         m = Md5MockClass()
         m.hexdigest.return_value = 'a78fa9f8asd'
         GetSizeMockClass.return_value = 10000
-        f = FTPMockClass()
+        f = self._ftp_mock(FTPMockClass)
 
         ftp = connection.FTPConnection(host='host',
                             user='user',
                             password='pass',
                             publisher_id='111111111',
                             preparer='Patrick',
-                            report_success=True)
+                            report_success=True,
+                            workers=1)
         v = video.Video(name="Some title",
                   reference_id='a532kallk3252a',
                   short_description="A short description.",
@@ -67,25 +79,19 @@ class FTPVideoTest(unittest.TestCase):
                 frame_width=640, frame_height=360)
         v.save()
 
-        self.assertEqual('login', f.method_calls[0][0])
-        self.assertEqual('set_pasv', f.method_calls[1][0])
-        self.assertEqual('storbinary', f.method_calls[2][0])
-        self.assertEqual('STOR 1500.flv', f.method_calls[2][1][0])
-
-        self.assertEqual('login', f.method_calls[3][0])
-        self.assertEqual('set_pasv', f.method_calls[4][0])
-        self.assertEqual('storbinary', f.method_calls[5][0])
-        self.assertEqual('STOR 700.flv', f.method_calls[5][1][0])
+        self.assertEqual(1, f.login.call_count)
+        commands = [call[0][0] for call in f.storbinary.call_args_list]
+        self.assertEqual(['STOR 1500.flv', 'STOR 700.flv', 'STOR poster.png'],
+            commands[:3])
+        self.assertTrue(re.match(r'STOR pybrightcove-manifest-\w+\.xml$',
+            commands[3]))
+        self.assertFalse(f.quit.called)
+        ftp.close()
+        self.assertEqual(1, f.quit.call_count)
 
-        self.assertEqual('login', f.method_calls[6][0])
-        self.assertEqual('set_pasv', f.method_calls[7][0])
-        self.assertEqual('storbinary', f.method_calls[8][0])
-        self.assertEqual('STOR poster.png', f.method_calls[8][1][0])
-
-        self.assertEqual('write', fd.method_calls[2][0])
         valid_xml = minidom.parse(
             open(os.path.join(os.path.dirname(__file__), 'test_ftp_video_batch_provision_manifest.xml'), 'rb'))
-        test_xml = minidom.parseString(fd.method_calls[2][1][0])
+        test_xml = minidom.parseString(f.manifests[0])
         self.assertEqual(
             valid_xml.toxml().replace('\t', '').replace('\n', ''),
             test_xml.toxml().replace('\t', '').replace('\n', ''))
@@ -94,23 +100,22 @@ class FTPVideoTest(unittest.TestCase):
     @mock.patch('hashlib.md5')
     @mock.patch('os.path.getsize')
     @mock.patch('__builtin__.file')
-    @mock.patch("os.fdopen")
-    def test_batch_provision_with_custom_metadata_video(self, FDOpenMockClass, OpenMockClass, 
+    def test_batch_provision_with_custom_metadata_video(self, OpenMockClass,
         GetSizeMockClass, Md5MockClass, FTPMockClass):
-        fd = FDOpenMockClass()
         o = OpenMockClass()
         o.read.return_value = None
         m = Md5MockClass()
         m.hexdigest.return_value = 'a78fa9f8asd'
         GetSizeMockClass.return_value = 10000
-        f = FTPMockClass()
+        f = self._ftp_mock(FTPMockClass)
 
         ftp = connection.FTPConnection(host='host',
                             user='user',
                             password='pass',
                             publisher_id='111111111',
                             preparer='Patrick',
-                            report_success=True)
+                            report_success=True,
+                            workers=1)
         v = video.Video(name="Some title",
                   reference_id='a532kallk3252a',
                   short_description="A short description.",
@@ -135,26 +140,284 @@ class FTPVideoTest(unittest.TestCase):
         v.add_custom_metadata("key_two", "String Value Two", enums.CustomMetaType.STRING)
         v.save()
 
-        self.assertEqual('login', f.method_calls[0][0])
-        self.assertEqual('set_pasv', f.method_calls[1][0])
-        self.assertEqual('storbinary', f.method_calls[2][0])
-        self.assertEqual('STOR 1500.flv', f.method_calls[2][1][0])
-
-        self.assertEqual('login', f.method_calls[3][0])
-        self.assertEqual('set_pasv', f.method_calls[4][0])
-        self.assertEqual('storbinary', f.method_calls[5][0])
-        self.assertEqual('STOR 700.flv', f.method_calls[5][1][0])
+        self.assertEqual(1, f.login.call_count)
+        commands = [call[0][0] for call in f.storbinary.call_args_list]
+        self.assertEqual(['STOR 1500.flv', 'STOR 700.flv', 'STOR poster.png'],
+            commands[:3])
+        self.assertTrue(re.match(r'STOR pybrightcove-manifest-\w+\.xml$',
+            commands[3]))
+        self.assertFalse(f.quit.called)
+        ftp.close()
+        self.assertEqual(1, f.quit.call_count)
 
-        self.assertEqual('login', f.method_calls[6][0])
-        self.assertEqual('set_pasv', f.method_calls[7][0])
-        self.assertEqual('storbinary', f.method_calls[8][0])
-        self.assertEqual('STOR poster.png', f.method_calls[8][1][0])
-
-        self.assertEqual('write', fd.method_calls[0][0])
         valid_xml = minidom.parse(
             open(os.path.join(os.path.dirname(__file__), 'test_ftp_video_batch_provision_with_custom_metadata_manifest.xml'), 'rb'))
-        test_xml = minidom.parseString(fd.method_calls[0][1][0])
+        test_xml = minidom.parseString(f.manifests[0])
         self.assertEqual(
             valid_xml.toxml().replace('\t', '').replace('\n', ''),
             test_xml.toxml().replace('\t', '').replace('\n', ''))
 
+
+
+class FTPResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ftp = connection.FTPConnection(host='host', user='user',
+            password='pass')
+
+    def _fail_first(self, f, filename='1500.flv'):
+        f.storbinary.side_effect = [EOFError(), None]
+        self.assertRaises(EOFError, self.ftp._send_file, filename)
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_resume_partial(self, FileMockClass, GetSizeMockClass,
+        FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        self._fail_first(f, '/videos/1500.flv')
+        f.size.side_effect = [9000, 10000]
+        self.ftp._send_file('/videos/1500.flv')
+        FileMockClass().seek.assert_called_with(9000)
+        f.storbinary.assert_called_with('STOR 1500.flv', FileMockClass(),
+            rest=9000)
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_skip_complete(self, FileMockClass, GetSizeMockClass,
+        FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        self._fail_first(f)
+        f.size.return_value = 10000
+        self.ftp._send_file('1500.flv')
+        self.assertEqual(1, f.storbinary.call_count)
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_foreign_file_overwritten(self, FileMockClass, GetSizeMockClass,
+        FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        f.size.return_value = 10000
+        self.ftp._send_file('1500.flv')
+        self.ftp._send_file('1500.flv')
+        self.assertEqual([None, None],
+            [call[1]['rest'] for call in f.storbinary.call_args_list])
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_other_local_file_not_resumed(self, FileMockClass,
+        GetSizeMockClass, FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        self._fail_first(f, '/a/1500.flv')
+        f.size.side_effect = [10000]
+        self.ftp._send_file('/b/1500.flv')
+        f.storbinary.assert_called_with('STOR 1500.flv', FileMockClass(),
+            rest=None)
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_larger_remote_overwritten(self, FileMockClass, GetSizeMockClass,
+        FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        self._fail_first(f)
+        f.size.side_effect = [20000, 10000]
+        self.ftp._send_file('1500.flv')
+        f.storbinary.assert_called_with('STOR 1500.flv', FileMockClass(),
+            rest=None)
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_no_resume(self, FileMockClass, GetSizeMockClass, FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        self._fail_first(f)
+        self.ftp.resume = False
+        f.size.side_effect = [10000]
+        self.ftp._send_file('1500.flv')
+        f.storbinary.assert_called_with('STOR 1500.flv', FileMockClass(),
+            rest=None)
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_incomplete(self, FileMockClass, GetSizeMockClass, FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        f.size.side_effect = [4000]
+        self.assertRaises(exceptions.IncompleteUploadError,
+            self.ftp._send_file, '1500.flv')
+
+    @mock.patch('pybrightcove.retry.time')
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_retry_resumes(self, FileMockClass, GetSizeMockClass,
+        FTPMockClass, TimeMock):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        f.size.side_effect = [4000, 4000, 10000]
+        self.ftp.retry = retry.RetryPolicy()
+        self.ftp._send_file('1500.flv')
+        self.assertEqual([None, 4000],
+            [call[1]['rest'] for call in f.storbinary.call_args_list])
+        self.assertEqual(1, self.ftp.retry.retries)
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_session_reused(self, FileMockClass, GetSizeMockClass,
+        FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        f.size.return_value = None
+        self.ftp._send_file('1500.flv')
+        self.ftp._send_file('700.flv')
+        self.assertEqual(1, f.login.call_count)
+        self.assertEqual(1, self.ftp.pool.size())
+        self.ftp.close()
+        self.assertEqual(1, f.quit.call_count)
+        self.assertEqual(0, self.ftp.pool.size())
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_failed_session_closed(self, FileMockClass, GetSizeMockClass,
+        FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        f = FTPMockClass()
+        f.size.return_value = None
+        f.storbinary.side_effect = EOFError()
+        self.assertRaises(EOFError, self.ftp._send_file, '1500.flv')
+        self.assertEqual(1, f.quit.call_count)
+        self.assertEqual(0, self.ftp.pool.size())
+
+
+class FTPParallelTest(unittest.TestCase):
+
+    def _connection(self, workers):
+        return connection.FTPConnection(host='host', user='user',
+            password='pass', publisher_id='111111111', preparer='Patrick',
+            report_success=True, workers=workers)
+
+    def _ftp_mock(self, FTPMockClass, fail=None):
+        """
+        Give each session a mock of its own, as Mock does not count calls
+        made from several threads reliably.
+        """
+        sessions = []
+        stored = []
+        lock = threading.Lock()
+        def storbinary(command, upload, rest=None):
+            if command == fail:
+                raise ftplib.error_perm('553 Could not create file.')
+            lock.acquire()
+            stored.append(command)
+            lock.release()
+        def session(**kwargs):
+            f = mock.Mock()
+            f.size.return_value = None
+            f.storbinary.side_effect = storbinary
+            lock.acquire()
+            sessions.append(f)
+            lock.release()
+            return f
+        FTPMockClass.side_effect = session
+        return sessions, stored
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_serial(self, FileMockClass, GetSizeMockClass, FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        sessions, stored = self._ftp_mock(FTPMockClass)
+        ftp = self._connection(workers=1)
+        ftp.post(xml='', assets=[{'filename': '1500.flv'},
+            {'filename': '700.flv'}])
+        self.assertEqual(['STOR 1500.flv', 'STOR 700.flv'], stored[:2])
+        self.assertTrue(stored[2].endswith('.xml'))
+        self.assertEqual(1, len(sessions))
+        ftp.close()
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_parallel_assets(self, FileMockClass, GetSizeMockClass,
+        FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        sessions, stored = self._ftp_mock(FTPMockClass)
+        ftp = self._connection(workers=3)
+        names = ['%d.flv' % i for i in range(10)]
+        ftp.post(xml='', assets=[{'filename': name} for name in names])
+        self.assertEqual(sorted(['STOR %s' % name for name in names]),
+            sorted(stored[:10]))
+        self.assertTrue(stored[10].endswith('.xml'))
+        self.assertTrue(1 <= len(sessions) <= 3)
+        ftp.close()
+        for f in sessions:
+            self.assertEqual(1, f.login.call_count)
+            self.assertEqual(1, f.quit.call_count)
+
+    @mock.patch('ftplib.FTP')
+    @mock.patch('os.path.getsize')
+    @mock.patch('__builtin__.file')
+    def test_no_manifest_on_failure(self, FileMockClass, GetSizeMockClass,
+        FTPMockClass):
+        GetSizeMockClass.return_value = 10000
+        sessions, stored = self._ftp_mock(FTPMockClass, fail='STOR 0.flv')
+        ftp = self._connection(workers=3)
+        names = ['%d.flv' % i for i in range(5)]
+        self.assertRaises(ftplib.error_perm, ftp.post, xml='',
+            assets=[{'filename': name} for name in names])
+        self.assertEqual(sorted(['STOR %s' % name for name in names[1:]]),
+            sorted(stored))
+        ftp.close()
+
+
+class FTPSessionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = connection.FTPSessionPool(max_size=2, idle_timeout=30)
+
+    def test_get_empty(self):
+        self.assertEqual(None, self.pool.get(('host', 'user')))
+
+    def test_put_get(self):
+        ftp = mock.Mock()
+        self.pool.put(('host', 'user'), ftp)
+        self.assertEqual(None, self.pool.get(('host', 'other')))
+        self.assertEqual(ftp, self.pool.get(('host', 'user')))
+        ftp.voidcmd.assert_called_with('NOOP')
+
+    def test_max_size(self):
+        sessions = [mock.Mock() for i in range(3)]
+        for ftp in sessions:
+            self.pool.put(('host', 'user'), ftp)
+        self.assertEqual(2, self.pool.size())
+        self.assertTrue(sessions[2].quit.called)
+
+    @mock.patch('pybrightcove.connection.time')
+    def test_idle_timeout(self, TimeMock):
+        ftp = mock.Mock()
+        TimeMock.time.return_value = 100
+        self.pool.put(('host', 'user'), ftp)
+        TimeMock.time.return_value = 131
+        self.assertEqual(None, self.pool.get(('host', 'user')))
+        self.assertTrue(ftp.quit.called)
+
+    def test_dead_session(self):
+        ftp = mock.Mock()
+        ftp.voidcmd.side_effect = EOFError()
+        ftp.quit.side_effect = EOFError()
+        self.pool.put(('host', 'user'), ftp)
+        self.assertEqual(None, self.pool.get(('host', 'user')))
+        self.assertTrue(ftp.close.called)
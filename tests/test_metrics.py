@@ -0,0 +1,138 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import socket
+import unittest
+import mock
+import pybrightcove
+from pybrightcove.metrics import PrometheusMetrics, StatsDMetrics, error_code
+
+
+class ErrorCodeTest(unittest.TestCase):
+
+    def test_brightcove_error(self):
+        error = pybrightcove.exceptions.CallTimeoutError()
+        self.assertEquals(error_code(error), '103')
+
+    def test_unmapped_brightcove_error(self):
+        error = pybrightcove.exceptions.BrightcoveError(raw_data={'code': 999})
+        self.assertEquals(error_code(error), '999')
+
+    def test_other_error(self):
+        self.assertEquals(error_code(socket.timeout()), 'timeout')
+
+
+class PrometheusMetricsTest(unittest.TestCase):
+
+    def test_render(self):
+        metrics = PrometheusMetrics(latency_buckets=(0.1, 1.0),
+            page_buckets=(1, 10))
+        metrics.request('find_all_videos', 0.05, 100)
+        metrics.request('find_all_videos', 0.5, 50,
+            pybrightcove.exceptions.CallTimeoutError())
+        metrics.pages('find_all_videos', 3)
+        text = metrics.render()
+        self.assertTrue('# TYPE pybrightcove_requests_total counter' in text)
+        self.assertTrue(
+            'pybrightcove_requests_total{command="find_all_videos"} 2' in text)
+        self.assertTrue('pybrightcove_errors_total'
+            '{code="103",command="find_all_videos"} 1' in text)
+        self.assertTrue('pybrightcove_response_bytes_total'
+            '{command="find_all_videos"} 150' in text)
+        self.assertTrue('pybrightcove_request_duration_seconds_bucket'
+            '{command="find_all_videos",le="0.1"} 1' in text)
+        self.assertTrue('pybrightcove_request_duration_seconds_bucket'
+            '{command="find_all_videos",le="+Inf"} 2' in text)
+        self.assertTrue('pybrightcove_result_set_pages_bucket'
+            '{command="find_all_videos",le="10.0"} 1' in text)
+        self.assertTrue(
+            'pybrightcove_result_set_pages_sum{command="find_all_videos"} 3.0'
+            in text)
+
+
+class StatsDMetricsTest(unittest.TestCase):
+
+    @mock.patch('socket.socket')
+    def test_request(self, SocketMock):
+        metrics = StatsDMetrics(prefix='bc')
+        metrics.request('find_video_by_id', 0.25, 10,
+            pybrightcove.exceptions.InvalidTokenError())
+        packet, address = SocketMock.return_value.sendto.call_args[0]
+        self.assertEquals(address, ('localhost', 8125))
+        self.assertEquals(packet.split('\n'), [
+            'bc.find_video_by_id.requests:1|c',
+            'bc.find_video_by_id.duration:250|ms',
+            'bc.find_video_by_id.response_bytes:10|c',
+            'bc.find_video_by_id.errors.210:1|c'])
+
+    @mock.patch('socket.socket')
+    def test_send_errors_are_ignored(self, SocketMock):
+        SocketMock.return_value.sendto.side_effect = socket.error
+        StatsDMetrics().pages('find_all_videos', 2)
+
+
+class ConnectionMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = mock.Mock(spec=pybrightcove.metrics.Metrics)
+        self.api = pybrightcove.connection.APIConnection(read_token="read",
+            write_token="write", metrics=self.metrics)
+
+    @mock.patch('httplib.HTTPConnection')
+    def test_get(self, HTTPMock):
+        h = HTTPMock()
+        h.host = 'api.brightcove.com'
+        r = h.getresponse.return_value
+        r.status = 200
+        r.will_close = True
+        r.read.return_value = '{"id": 1}'
+        self.api.get_item('find_video_by_id', video_id=1)
+        command, seconds, size, error = self.metrics.request.call_args[0]
+        self.assertEquals((command, size, error),
+            ('find_video_by_id', 9, None))
+        self.assertTrue(seconds >= 0)
+
+    @mock.patch('httplib.HTTPConnection')
+    def test_error(self, HTTPMock):
+        h = HTTPMock()
+        h.host = 'api.brightcove.com'
+        r = h.getresponse.return_value
+        r.status = 200
+        r.will_close = True
+        r.read.return_value = '{"error": {"code": 103}, "result": null}'
+        self.assertRaises(pybrightcove.exceptions.CallTimeoutError,
+            self.api.post, 'update_video', video={})
+        command, seconds, size, error = self.metrics.request.call_args[0]
+        self.assertEquals(command, 'update_video')
+        self.assertTrue(
+            isinstance(error, pybrightcove.exceptions.CallTimeoutError))
+
+    def test_pages(self):
+        def get_list(command, page_size, page_number, **kwargs):
+            c = mock.Mock()
+            c.items = range(page_number * 10, min((page_number + 1) * 10, 25))
+            c.total_count = 25
+            c.page_size = page_size
+            return c
+        self.api.get_list = mock.Mock(side_effect=get_list)
+        result_set = pybrightcove.connection.ItemResultSet('find_all_videos',
+            pybrightcove.video.Video, self.api, page_size=10)
+        self.assertEquals(len(list(result_set)), 25)
+        self.metrics.pages.assert_called_with('find_all_videos', 4)
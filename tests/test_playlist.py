@@ -26,6 +26,7 @@ import unittest
 import uuid
 import mock
 
+from pybrightcove import connection
 from pybrightcove import enums
 from pybrightcove import exceptions
 from pybrightcove import playlist
@@ -44,6 +45,11 @@ class PlaylistTest(unittest.TestCase):
 
     def setUp(self):
         self.test_uuid = str(uuid.uuid4())
+        # Tests patch APIConnection, so the default must be created anew.
+        connection.set_default_connection(None)
+
+    def tearDown(self):
+        connection.set_default_connection(None)
 
     def _get_list_mock(self, ConnectionMock):
         m = ConnectionMock()
@@ -0,0 +1,114 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import mock
+import pybrightcove
+from pybrightcove.ratelimit import RateLimiter, TokenBucket, FileTokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    @mock.patch('pybrightcove.ratelimit.time')
+    def test_calls_are_spaced(self, TimeMock):
+        TimeMock.time.return_value = 100.0
+        SleepMock = TimeMock.sleep
+        bucket = TokenBucket(rate=4, burst=2)
+        for i in range(4):
+            bucket.acquire()
+        waits = [c[0][0] for c in SleepMock.call_args_list]
+        self.assertEquals(waits, [0.25, 0.5])
+
+    @mock.patch('pybrightcove.ratelimit.time')
+    def test_refill(self, TimeMock):
+        TimeMock.time.return_value = 100.0
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.acquire()
+        TimeMock.time.return_value = 105.0
+        bucket.acquire()
+        self.assertFalse(TimeMock.sleep.called)
+
+    @mock.patch('pybrightcove.ratelimit.time')
+    def test_threads_share_bucket(self, TimeMock):
+        TimeMock.time.side_effect = time.time
+        SleepMock = TimeMock.sleep
+        bucket = TokenBucket(rate=10, burst=1)
+        threads = [threading.Thread(target=bucket.acquire) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        waits = sorted([c[0][0] for c in SleepMock.call_args_list])
+        self.assertEquals(len(waits), 4)
+        self.assertTrue(waits[-1] > 0.35)
+
+
+class FileTokenBucketTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'rate')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    @mock.patch('pybrightcove.ratelimit.time')
+    def test_state_is_shared(self, TimeMock):
+        TimeMock.time.return_value = 100.0
+        FileTokenBucket(self.path, rate=2).acquire()
+        FileTokenBucket(self.path, rate=2).acquire()
+        TimeMock.sleep.assert_called_once_with(0.5)
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_separate_budgets(self):
+        limiter = RateLimiter(read_rate=5)
+        limiter.read = mock.Mock()
+        limiter.acquire(write=True)
+        limiter.acquire()
+        self.assertEquals(limiter.read.acquire.call_count, 1)
+        self.assertEquals(limiter.write, None)
+
+    def test_file_buckets(self):
+        limiter = RateLimiter(read_rate=5, write_rate=1, path='/tmp/x')
+        self.assertEquals(limiter.read.path, '/tmp/x.read')
+        self.assertEquals(limiter.write.path, '/tmp/x.write')
+
+    @mock.patch('httplib.HTTPConnection')
+    def test_connection(self, HTTPMock):
+        h = HTTPMock()
+        h.host = 'api.brightcove.com'
+        r = h.getresponse.return_value
+        r.status = 200
+        r.will_close = True
+        r.read.return_value = '{"result": 1}'
+        limiter = mock.Mock()
+        api = pybrightcove.connection.APIConnection(read_token="read",
+            write_token="write", rate_limiter=limiter)
+        api.get_item('find_video_by_id', video_id=1)
+        api.post('delete_video', video_id=1)
+        self.assertEquals(limiter.acquire.call_args_list,
+            [((False, ), {}), ((True, ), {})])
@@ -0,0 +1,160 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import socket
+import urllib2
+import unittest
+import mock
+import pybrightcove
+from pybrightcove.retry import RetryPolicy, is_retryable
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def _failing(self, *errors):
+        results = list(errors)
+
+        def func():
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return mock.Mock(side_effect=func)
+
+    def test_is_retryable(self):
+        self.assertTrue(is_retryable(pybrightcove.exceptions.CallTimeoutError()))
+        self.assertTrue(is_retryable(
+            pybrightcove.exceptions.UnknownServerError()))
+        self.assertTrue(is_retryable(socket.error(104, 'reset')))
+        self.assertTrue(is_retryable(
+            urllib2.HTTPError('http://x', 503, 'busy', {}, None)))
+        self.assertFalse(is_retryable(
+            urllib2.HTTPError('http://x', 404, 'missing', {}, None)))
+        self.assertFalse(is_retryable(
+            pybrightcove.exceptions.InvalidTokenError()))
+        self.assertFalse(is_retryable(ValueError()))
+
+    @mock.patch('pybrightcove.retry.time')
+    def test_retries_transient_errors(self, TimeMock):
+        SleepMock = TimeMock.sleep
+        func = self._failing(pybrightcove.exceptions.CallTimeoutError(),
+            socket.error(104, 'reset'), 'ok')
+        policy = RetryPolicy(base_delay=1, max_delay=3)
+        self.assertEquals(policy.call(func), 'ok')
+        self.assertEquals(func.call_count, 3)
+        self.assertEquals(policy.retries, 2)
+        self.assertEquals(SleepMock.call_count, 2)
+        self.assertTrue(0 <= SleepMock.call_args_list[1][0][0] <= 2)
+
+    @mock.patch('pybrightcove.retry.time')
+    def test_fatal_errors_are_raised(self, TimeMock):
+        func = self._failing(pybrightcove.exceptions.InvalidTokenError(), 'ok')
+        self.assertRaises(pybrightcove.exceptions.InvalidTokenError,
+            RetryPolicy().call, func)
+        self.assertEquals(func.call_count, 1)
+
+    @mock.patch('pybrightcove.retry.time')
+    def test_max_attempts(self, TimeMock):
+        error = pybrightcove.exceptions.UnknownServerError()
+        func = self._failing(error, error, error, 'ok')
+        self.assertRaises(pybrightcove.exceptions.UnknownServerError,
+            RetryPolicy(max_attempts=3).call, func)
+        self.assertEquals(func.call_count, 3)
+
+    @mock.patch('pybrightcove.retry.time')
+    def test_writes_are_opt_in(self, TimeMock):
+        error = pybrightcove.exceptions.UnknownServerError()
+        self.assertRaises(pybrightcove.exceptions.UnknownServerError,
+            RetryPolicy().call, self._failing(error, 'ok'), True)
+        self.assertEquals(RetryPolicy(retry_writes=True).call(
+            self._failing(error, 'ok'), True), 'ok')
+
+    @mock.patch('pybrightcove.retry.time')
+    def test_no_retry(self, TimeMock):
+        error = pybrightcove.exceptions.CallTimeoutError()
+        func = self._failing(error, 'ok')
+        self.assertRaises(pybrightcove.exceptions.CallTimeoutError,
+            RetryPolicy().call, func, False,
+            (pybrightcove.exceptions.CallTimeoutError, ))
+        self.assertEquals(func.call_count, 1)
+
+    @mock.patch('pybrightcove.retry.time')
+    def test_budget(self, TimeMock):
+        error = pybrightcove.exceptions.UnknownServerError()
+        policy = RetryPolicy(budget_max=2, budget_ratio=0.5)
+        self.assertEquals(policy.call(self._failing(error, error, 'ok')), 'ok')
+        self.assertRaises(pybrightcove.exceptions.UnknownServerError,
+            policy.call, self._failing(error, 'ok'))
+        self.assertEquals(policy.call(self._failing(error, 'ok')), 'ok')
+        self.assertEquals(policy.retries, 3)
+
+
+class ConnectionRetryTest(unittest.TestCase):
+
+    @mock.patch('pybrightcove.retry.time')
+    @mock.patch('httplib.HTTPConnection')
+    def test_read_is_retried(self, HTTPMock, TimeMock):
+        h = HTTPMock()
+        h.host = 'api.brightcove.com'
+        r = h.getresponse.return_value
+        r.status = 200
+        r.will_close = True
+        r.read.side_effect = ['{"error": {"code": 103}, "result": null}',
+                              '{"id": 1}']
+        api = pybrightcove.connection.APIConnection(read_token="read",
+            retry=RetryPolicy())
+        self.assertEquals(api.get_item('find_video_by_id', video_id=1),
+            {'id': 1})
+        self.assertEquals(h.request.call_count + h.putrequest.call_count, 2)
+
+    @mock.patch('pybrightcove.retry.time')
+    @mock.patch('httplib.HTTPConnection')
+    def test_write_is_not_retried(self, HTTPMock, TimeMock):
+        h = HTTPMock()
+        h.host = 'api.brightcove.com'
+        r = h.getresponse.return_value
+        r.status = 200
+        r.will_close = True
+        r.read.side_effect = ['{"error": {"code": 100}, "result": null}',
+                              '{"result": 1}']
+        api = pybrightcove.connection.APIConnection(read_token="read",
+            write_token="write", retry=RetryPolicy())
+        self.assertRaises(pybrightcove.exceptions.UnknownServerError,
+            api.post, 'delete_video', video_id=1)
+
+    @mock.patch('pybrightcove.retry.time')
+    @mock.patch('httplib.HTTPConnection')
+    def test_list_no_retry(self, HTTPMock, TimeMock):
+        h = HTTPMock()
+        h.host = 'api.brightcove.com'
+        r = h.getresponse.return_value
+        r.status = 200
+        r.will_close = True
+        r.read.side_effect = ['{"error": {"code": 103}, "result": null}',
+            '{"items": [], "total_count": 0, "page_number": 0, '
+            '"page_size": 10}']
+        api = pybrightcove.connection.APIConnection(read_token="read",
+            retry=RetryPolicy())
+        self.assertRaises(pybrightcove.exceptions.CallTimeoutError,
+            api.get_list, 'find_all_videos', pybrightcove.video.Video, 10, 0,
+            None, None,
+            _no_retry=(pybrightcove.exceptions.CallTimeoutError, ))
+        self.assertEquals(h.putrequest.call_count, 1)
+        self.assertFalse('no_retry' in h.putrequest.call_args[0][1])
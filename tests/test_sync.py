@@ -0,0 +1,83 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+import mock
+from pybrightcove import enums, exceptions
+from pybrightcove.sync import CatalogMirror, SQLiteStore, MODIFIED_FILTERS
+from pybrightcove.video import Video
+from tests.test_video import VIDEO_DATA
+
+
+def _video_data(video_id, **kwargs):
+    data = dict(VIDEO_DATA)
+    data['id'] = video_id
+    data.update(kwargs)
+    return data
+
+
+class CatalogMirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SQLiteStore(':memory:')
+        self.connection = mock.Mock()
+        self.mirror = CatalogMirror(self.store, _connection=self.connection)
+
+    def _page(self, items):
+        c = mock.Mock()
+        c.items = [Video(data=data, _connection=self.connection)
+            for data in items]
+        c.total_count = len(items)
+        c.page_size = 0
+        self.connection.get_list.return_value = c
+
+    @mock.patch('time.time')
+    def test_full_then_incremental(self, TimeMock):
+        TimeMock.return_value = 1300000000
+        self._page([_video_data(1), _video_data(2), _video_data(3)])
+        self.assertEquals(self.mirror.sync(), 3)
+        self.assertEquals(len(self.store), 3)
+        self.assertEquals(self.connection.get_list.call_args[0][0],
+            'find_all_videos')
+        self.assertEquals(self.store.get_high_water_mark(), 1300000000)
+
+        TimeMock.return_value = 1300003600
+        self._page([_video_data(2, name='Renamed'),
+            _video_data(3, itemState=enums.ItemStateEnum.DELETED)])
+        self.assertEquals(self.mirror.sync(), 2)
+        args, kwargs = self.connection.get_list.call_args
+        self.assertEquals(args[0], 'find_modified_videos')
+        self.assertEquals(kwargs['filter'], MODIFIED_FILTERS)
+        self.assertEquals(kwargs['from_date'], (1300000000 - 300) / 60)
+        self.assertEquals(len(self.store), 2)
+        self.assertEquals(self.mirror.get(2).name, 'Renamed')
+        self.assertEquals(self.mirror.get(3), None)
+        self.assertEquals(self.store.get_high_water_mark(), 1300003600)
+
+    def test_failed_run_keeps_high_water_mark(self):
+        self._page([_video_data(1)])
+        self.mirror.sync()
+        mark = self.store.get_high_water_mark()
+        self.connection.get_list.side_effect = \
+            exceptions.CallTimeoutError()
+        self.assertRaises(exceptions.CallTimeoutError,
+            self.mirror.sync)
+        self.assertEquals(self.store.get_high_water_mark(), mark)
+
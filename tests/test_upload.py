@@ -0,0 +1,85 @@
+# Copyright (c) 2009 StudioNow, Inc <patrick@studionow.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import time
+import threading
+import unittest
+import mock
+from pybrightcove import exceptions
+from pybrightcove.upload import UploadManager, QUEUED, UPLOADING, DONE, FAILED
+from pybrightcove.video import Video
+
+
+class UploadManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = mock.Mock()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        self.connection.post.side_effect = self._post
+        self.events = []
+
+    def _post(self, command, filename, **kwargs):
+        self.lock.acquire()
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        self.lock.release()
+        time.sleep(0.05)
+        self.lock.acquire()
+        self.active -= 1
+        self.lock.release()
+        if filename == 'broken.mov':
+            raise exceptions.NonmatchingChecksumError()
+        return int(filename.split('.')[0])
+
+    def _video(self, filename):
+        return Video(filename=filename, name=filename,
+            short_description=filename, _connection=self.connection)
+
+    @mock.patch('pybrightcove.checksum.md5_async')
+    def test_concurrent_uploads(self, HashMock):
+        manager = UploadManager(workers=3, progress=lambda video, state,
+            value: self.events.append((video.name, state, value)))
+        videos = [self._video('%d.mov' % i) for i in range(1, 7)]
+        results = [manager.submit(v) for v in videos]
+        manager.close()
+        self.assertEquals([r.get() for r in results], range(1, 7))
+        self.assertEquals([v.id for v in videos], range(1, 7))
+        self.assertEquals(self.max_active, 3)
+        self.assertEquals([c[0][0] for c in HashMock.call_args_list],
+            ['%d.mov' % i for i in range(1, 7)])
+        self.assertEquals(manager.done, 6)
+        events = [e for e in self.events if e[0] == '2.mov']
+        self.assertEquals(events, [('2.mov', QUEUED, None),
+            ('2.mov', UPLOADING, None), ('2.mov', DONE, 2)])
+
+    @mock.patch('pybrightcove.checksum.md5_async')
+    def test_errors(self, HashMock):
+        manager = UploadManager(workers=2, progress=lambda video, state,
+            value: self.events.append((video.name, state, value)))
+        ok = manager.submit(self._video('1.mov'))
+        broken = manager.submit(self._video('broken.mov'))
+        manager.close()
+        self.assertEquals(ok.get(), 1)
+        self.assertRaises(exceptions.NonmatchingChecksumError, broken.get)
+        self.assertEquals((manager.done, manager.failed), (1, 1))
+        self.assertTrue(('broken.mov', FAILED) in
+            [event[:2] for event in self.events])
@@ -118,6 +118,11 @@ class VideoTest(unittest.TestCase):
 
     def setUp(self):
         self.test_uuid = str(uuid.uuid4())
+        # Tests patch APIConnection, so the default must be created anew.
+        pybrightcove.connection.set_default_connection(None)
+
+    def tearDown(self):
+        pybrightcove.connection.set_default_connection(None)
 
     def _get_list_mock(self, ConnectionMock):
         m = ConnectionMock()
@@ -580,3 +585,120 @@ class VideoTest(unittest.TestCase):
                 "Video.video_full_length must be of type Rendition")
         else:
             self.fail("Expected pybrightcove.exceptions.PyBrightcoveError.")
+
+
+def _is_set(obj, name):
+    """
+    Check whether an attribute slot holds a value without triggering lazy
+    loading.
+    """
+    try:
+        getattr(type(obj), name).__get__(obj)
+        return True
+    except AttributeError:
+        return False
+
+
+class LazyVideoTest(unittest.TestCase):
+
+    ATTRIBUTES = ('id', 'name', 'reference_id', 'short_description',
+        'long_description', 'creation_date', 'last_modified_date',
+        'published_date', 'start_date', 'end_date', 'economics', 'length',
+        'link_text', 'link_url', 'plays_total', 'plays_trailing_week', 'tags',
+        'thumbnail_url', 'video_still_url', 'renditions', 'assets',
+        'metadata', 'item_state', 'image', 'raw_data')
+
+    def setUp(self):
+        self.connection = mock.Mock()
+
+    def test_lazy_matches_eager(self):
+        eager = pybrightcove.video.Video(data=VIDEO_DATA,
+            _connection=self.connection)
+        lazy = pybrightcove.video.Video.lazy_load(VIDEO_DATA,
+            _connection=self.connection)
+        self.assertFalse(_is_set(lazy, 'creation_date'))
+        for name in self.ATTRIBUTES:
+            self.assertEquals(getattr(lazy, name), getattr(eager, name))
+        self.assertEquals(lazy._to_dict(), eager._to_dict())
+        self.assertTrue(_is_set(lazy, 'creation_date'))
+        self.assertRaises(AttributeError, getattr, lazy, 'not_an_attribute')
+
+    def test_assignment_before_access(self):
+        lazy = pybrightcove.video.Video.lazy_load(VIDEO_DATA,
+            _connection=self.connection)
+        lazy.name = 'Renamed'
+        lazy.tags.append('new')
+        self.assertEquals(lazy.name, 'Renamed')
+        self.assertEquals(lazy.tags, VIDEO_DATA['tags'] + ['new'])
+        self.assertEquals(VIDEO_DATA['tags'], ['tag1', 'tag2', 'tag3'])
+
+    def test_server_data_is_trusted(self):
+        data = dict(VIDEO_DATA)
+        data['name'] = 'x' * 300
+        eager = pybrightcove.video.Video(data=data,
+            _connection=self.connection)
+        lazy = pybrightcove.video.Video.lazy_load(data,
+            _connection=self.connection)
+        self.assertEquals(lazy.name, eager.name)
+        self.assertRaises(pybrightcove.exceptions.PyBrightcoveError, setattr,
+            lazy, 'name', 'y' * 300)
+
+    def test_lazy_result_set(self):
+        self.connection.get_list.side_effect = \
+            lambda *args, **kwargs: pybrightcove.connection.ItemCollection(
+                {'items': [VIDEO_DATA], 'total_count': 1, 'page_number': 0,
+                 'page_size': 0}, kwargs['item_class'], self.connection)
+        result_set = pybrightcove.video.Video.find_all(
+            _connection=self.connection)
+        result_set.lazy = True
+        videos = list(result_set)
+        self.assertEquals(len(videos), 1)
+        self.assertFalse(_is_set(videos[0], 'name'))
+        self.assertEquals(videos[0].name, VIDEO_DATA['name'])
+
+
+class CompactRepresentationTest(unittest.TestCase):
+
+    def test_no_instance_dict(self):
+        objects = [pybrightcove.video.Video(data=VIDEO_DATA,
+                _connection=mock.Mock()),
+            pybrightcove.video.Rendition(), pybrightcove.video.CuePoint(),
+            pybrightcove.video.Image(data=IMAGE_DATA)]
+        for obj in objects:
+            self.assertFalse(hasattr(obj, '__dict__'))
+            self.assertRaises(AttributeError, setattr, obj, 'misspelt', 1)
+
+    def test_interned_tags(self):
+        data = dict(VIDEO_DATA)
+        data['tags'] = [''.join(['ta', 'g1']), u'unicode tag']
+        v1 = pybrightcove.video.Video(data=data, _connection=mock.Mock())
+        data['tags'] = [''.join(['tag', '1']), u' '.join([u'unicode', u'tag'])]
+        v2 = pybrightcove.video.Video(data=data, _connection=mock.Mock())
+        self.assertTrue(v1.tags[0] is v2.tags[0])
+        self.assertTrue(v1.tags[1] is v2.tags[1])
+
+    def test_interned_values_are_bounded(self):
+        intern_value = pybrightcove.fields.intern_value
+        free = intern_value(u''.join([u'FR', u'EE']))
+        with mock.patch('pybrightcove.fields.INTERN_LIMIT', 2):
+            tags = [intern_value(u'tag %d' % i) for i in range(5)]
+            self.assertTrue(len(pybrightcove.fields._interned) <= 2)
+            self.assertTrue(intern_value(u'tag 4') is tags[4])
+            self.assertTrue(intern_value(u''.join([u'FRE', u'E'])) is free)
+
+
+class FieldValidationTest(unittest.TestCase):
+
+    def test_unconstrained_fields_use_plain_slots(self):
+        Video = pybrightcove.video.Video
+        self.assertTrue(isinstance(Video.__dict__['name'],
+            pybrightcove.fields.ValidatedSlot))
+        self.assertFalse(isinstance(Video.__dict__['link_url'],
+            pybrightcove.fields.ValidatedSlot))
+
+    def test_empty_values_are_not_validated(self):
+        video = pybrightcove.video.Video(data=VIDEO_DATA,
+            _connection=mock.Mock())
+        video.economics = None
+        video.item_state = ''
+        self.assertEquals(video.economics, None)